@@ -0,0 +1,166 @@
+# Shared HTTP client for the start.gg API
+
+import time
+import random
+import threading
+import requests
+from dataclasses import dataclass
+from requests.adapters import HTTPAdapter
+from rich import print
+from rich.table import Table
+
+import utils
+import profiling
+from scheduler import TokenBucket, MAX_WORKERS
+
+# (connect, read) timeouts in seconds
+TIMEOUT = (5, 30)
+MAX_RETRIES = 5
+BACKOFF_BASE = 1
+MAX_BACKOFF = 30
+SLOW_CALL_SECONDS = 5
+
+TRANSIENT_ERRORS = (requests.ConnectionError, requests.Timeout)
+
+
+@dataclass
+class CallStats:
+    name: str
+    status: int
+    latency: float
+    bytes: int
+    attempts: int
+
+
+@dataclass
+class RequestStats:
+    """Totals for every call to one kind of request, so long sessions don't keep a record per call."""
+    calls: int = 0
+    failed: int = 0
+    retries: int = 0
+    latency: float = 0
+    maxLatency: float = 0
+    bytes: int = 0
+
+    def add(self, call: CallStats) -> None:
+        self.calls += 1
+        self.failed += call.status == 0 or call.status >= 400
+        self.retries += call.attempts > 1
+        self.latency += call.latency
+        self.maxLatency = max(self.maxLatency, call.latency)
+        self.bytes += call.bytes
+
+
+class Client:
+    session: requests.Session
+    limiter: TokenBucket
+    stats: dict[str, RequestStats]
+
+    def __init__(self, token: str, limiter: TokenBucket) -> None:
+        self.token = token
+        self.limiter = limiter
+        self.stats = {}
+        self.statsLock = threading.Lock()
+
+        # One keep-alive connection per worker so concurrent page fetches don't open new sockets
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=MAX_WORKERS)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update({'Accept': 'application/json',
+                                     'Accept-Encoding': 'gzip, deflate'})
+
+    def backoff(self, attempt: int) -> None:
+        # Full jitter keeps concurrent workers from retrying in lockstep
+        time.sleep(random.uniform(0, min(MAX_BACKOFF, BACKOFF_BASE * 2 ** attempt)))
+
+    def record(self, stats: CallStats) -> None:
+        with self.statsLock:
+            self.stats.setdefault(stats.name, RequestStats()).add(stats)
+        if stats.latency > SLOW_CALL_SECONDS:
+            print(f'[yellow]Slow request: {stats.name} took {stats.latency:.1f}s')
+
+    def request(self, method: str, url: str, name: str, limited: bool = True, **kwargs) -> requests.Response:
+        """Send a request, retrying connection errors, timeouts, 429s and 5xx responses."""
+        error = None
+        for attempt in range(MAX_RETRIES):
+            if limited:
+                with profiling.span('api.wait'):
+                    self.limiter.acquire()
+
+            start = time.perf_counter()
+            try:
+                with profiling.span(f'api.{name}'):
+                    res = self.session.request(
+                        method, url, timeout=TIMEOUT, **kwargs)
+            except TRANSIENT_ERRORS as err:
+                error = err
+                self.record(CallStats(name, 0, time.perf_counter() - start, 0, attempt + 1))
+                self.backoff(attempt)
+                continue
+
+            self.record(CallStats(name, res.status_code, time.perf_counter() - start,
+                                  int(res.headers.get('Content-Length', len(res.content))), attempt + 1))
+
+            if res.status_code == 429:
+                error = utils.RateLimitError(f'Rate limited while requesting {name}')
+                retryAfter = res.headers.get('Retry-After')
+                delay = int(retryAfter) if retryAfter and retryAfter.isdigit() else BACKOFF_BASE * 2 ** (attempt + 1)
+                if limited:
+                    self.limiter.pause(delay)
+                else:
+                    # Unlimited requests never wait on the limiter, so wait here before retrying
+                    time.sleep(delay)
+                continue
+            if res.status_code >= 500:
+                error = utils.APIError(f'{name} failed with status {res.status_code}')
+                self.backoff(attempt)
+                continue
+            if res.status_code >= 400:
+                raise utils.APIError(f'{name} failed with status {res.status_code}')
+
+            return res
+
+        if isinstance(error, utils.APIError):
+            raise error
+        raise utils.APIError(f'{name} failed after {MAX_RETRIES} attempts: {error}')
+
+    def query(self, url: str, query: str, variables: dict, name: str = 'query') -> dict:
+        res = self.request('POST', url, name, headers={'Authorization': f'Bearer {self.token}'},
+                           json={'query': query, 'variables': variables})
+        try:
+            body = res.json()
+        except ValueError:
+            raise utils.APIError(f'{name} returned invalid JSON')
+
+        if body.get('errors') and not body.get('data'):
+            message = body['errors'][0].get('message', str(body['errors']))
+            if 'complexity' in message.lower():
+                raise utils.QueryComplexityError(f'{name} failed: {message}')
+            raise utils.APIError(f'{name} failed: {message}')
+        return body['data']
+
+    def get(self, url: str, name: str = 'get'):
+        res = self.request('GET', url, name, limited=False)
+        try:
+            return res.json()
+        except ValueError:
+            raise utils.APIError(f'{name} returned invalid JSON')
+
+    def summary_table(self):
+        table = Table(title='API Calls')
+        table.add_column('Request')
+        table.add_column('Calls', justify='right')
+        table.add_column('Failed', justify='right')
+        table.add_column('Retries', justify='right')
+        table.add_column('Avg (s)', justify='right')
+        table.add_column('Max (s)', justify='right')
+        table.add_column('KB', justify='right')
+
+        with self.statsLock:
+            for name, stats in self.stats.items():
+                table.add_row(name, str(stats.calls), str(stats.failed), str(stats.retries),
+                              f'{stats.latency / stats.calls:.2f}', f'{stats.maxLatency:.2f}',
+                              f'{stats.bytes / 1024:.1f}')
+
+        return table
@@ -0,0 +1,177 @@
+# Headless labelling driven by a manifest file
+
+import os
+import csv
+import json
+from rich import print
+from rich.table import Table
+
+import utils
+import templates
+import discovery
+import thumbnails
+from vod import VOD
+from journal import Journal
+from startgg import Tournament, Event, Phase, Set
+
+FILENAME_FIELD = 'filename'
+SET_FIELD = 'set'
+SWAP_FIELD = 'swap'
+P1_CHARS_FIELD = 'p1Characters'
+P2_CHARS_FIELD = 'p2Characters'
+
+# Any TemplateArgs value can be overridden by a column/key of the same name
+OVERRIDE_FIELDS = [*templates.PLACEHOLDERS.values()]
+FIELDS = [FILENAME_FIELD, SET_FIELD, SWAP_FIELD,
+          P1_CHARS_FIELD, P2_CHARS_FIELD, *OVERRIDE_FIELDS]
+
+TRUE_VALUES = ['1', 'true', 'yes', 'y', 'x']
+
+
+def load_manifest(path: str) -> list[dict]:
+    """Read a CSV file with a header row, or a JSON list of objects / object of filename -> object."""
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        if path.lower().endswith('.json'):
+            data = json.load(f)
+            if isinstance(data, dict):
+                data = [{FILENAME_FIELD: filename, **row} for filename, row in data.items()]
+            return data
+        return [*csv.DictReader(f)]
+
+
+def resolve_set(tournament: Tournament, id: str) -> tuple[Event, Phase, Set]:
+    try:
+        i = [i for i in map(int, id.split('.'))]
+        event = tournament.events[i[0]]
+        phase = event.phases[i[1]]
+        return event, phase, phase.sets[i[2]]
+    except (ValueError, IndexError):
+        raise utils.ManifestError(f'Invalid set index: {id}')
+
+
+def parse_characters(set: Set, chars: str) -> list:
+    try:
+        return [set.videoGame.get_character(name=c.strip()) for c in chars.split(';') if c.strip()]
+    except utils.CharacterNotFoundError as err:
+        raise utils.ManifestError(str(err))
+
+
+def find_video(videos: dict[str, list[VOD]], filename: str) -> VOD:
+    found = videos.get(filename)
+    if not found:
+        raise utils.ManifestError(f'Video not found: {filename}')
+    if len(found) > 1:
+        raise utils.ManifestError(f'Several videos are named {filename}: {", ".join(v.path for v in found)}')
+    return found[0]
+
+
+def process_row(tournament: Tournament, row: dict, videos: dict[str, list[VOD]]) -> VOD:
+    unknown = [k for k in row if k not in FIELDS]
+    if unknown:
+        raise utils.ManifestError(f'Unknown field{"s" if len(unknown) > 1 else ""}: {", ".join(map(str, unknown))}')
+
+    filename = str(row.get(FILENAME_FIELD) or '').strip()
+    if not filename:
+        raise utils.ManifestError('Missing filename')
+    vod = find_video(videos, filename)
+
+    vod.tournament = tournament
+    vod.event, vod.phase, vod.set = resolve_set(
+        tournament, str(row.get(SET_FIELD) or '').strip())
+
+    # Template args copy the set data, so resetting the shared set for each row is safe
+    vod.set.p1 = 1 if str(row.get(SWAP_FIELD) or '').strip().lower() in TRUE_VALUES else 0
+    for field, player in ((P1_CHARS_FIELD, vod.set.players[vod.set.p1]), (P2_CHARS_FIELD, vod.set.players[1 - vod.set.p1])):
+        if row.get(field):
+            player.characters = parse_characters(vod.set, str(row[field]))
+
+    vod.templateArgs = templates.TemplateArgs(
+        vod.tournament, vod.event, vod.phase, vod.set)
+    for field in OVERRIDE_FIELDS:
+        if row.get(field):
+            setattr(vod.templateArgs, field, str(row[field]))
+
+    return vod
+
+
+def run(tournament: Tournament, rows: list[dict], videos: dict[str, list[VOD]]) -> tuple[list[VOD], list[tuple[int, str, str]]]:
+    """Label every row against the tournament and the videos found by filename. Returns the labelled VODs and (row, filename, error) for rows that failed."""
+    # Download every phase the manifest points at in one go instead of one at a time
+    phaseIds = {'.'.join(str(r.get(SET_FIELD) or '').split('.')[:2]) for r in rows}
+    try:
+        tournament.load_sets([p for id in phaseIds if id.count('.') == 1
+                              for p in tournament.filter_phases([id])])
+    except utils.APIError as err:
+        # Phases that failed are retried (and reported) by the rows that need them
+        print(f'[yellow]{err}')
+
+    vods = []
+    errors = []
+    for i, row in enumerate(rows, 1):
+        try:
+            vods.append(process_row(tournament, row, videos))
+        except (utils.ManifestError, utils.APIError) as err:
+            errors.append((i, str(row.get(FILENAME_FIELD, '')), str(err)))
+
+    titles = templates.TITLE.render_many([v.templateArgs for v in vods])
+    descriptions = templates.DESCRIPTION.render_many([v.templateArgs for v in vods])
+    for vod, title, description in zip(vods, titles, descriptions):
+        vod.title = title
+        vod.description = description
+        vod.processed = True
+
+    return vods, errors
+
+
+def error_table(errors: list[tuple[int, str, str]]):
+    table = Table(title='[red]Failed rows', expand=False)
+    table.add_column('Row', justify='right')
+    table.add_column('Filename')
+    table.add_column('Error', style='red')
+    for row, filename, error in errors:
+        table.add_row(str(row), filename, error)
+    return table
+
+
+def main(manifestPath: str, link: str, journal: Journal, makeThumbnails: bool = False, roots: list[str] = None) -> None:
+    try:
+        rows = load_manifest(manifestPath)
+    except (OSError, ValueError) as err:
+        print(f'[red]Could not read manifest {manifestPath}:[/red] {err}')
+        return
+
+    try:
+        tournament = Tournament(utils.parse_link(link))
+    except utils.InvalidLinkError:
+        print(f'[red]Invalid link:[/red] {link}')
+        return
+    except utils.TournamentNotFoundError:
+        print(f'[red]Tournament not found:[/red] {link}')
+        return
+    except utils.APIError as err:
+        print(f'[red]Failed to get tournament data:[/red] {err}')
+        return
+
+    setAside = journal.set_aside(tournament.slug)
+    if setAside:
+        print(f'[yellow]{setAside} videos labelled for another tournament were moved to {journal.path}.bak')
+    journal.load()
+
+    # Manifests name videos by filename, find them in the video folders (and their station subfolders) like a normal session
+    videos = {}
+    for vod in discovery.discover(roots or [utils.VIDEOS_PATH]):
+        videos.setdefault(vod.filename, []).append(vod)
+
+    vods, errors = run(tournament, rows, videos)
+    if errors:
+        print(error_table(errors))
+    print(f'[green]Labelled {len(vods)} of {len(rows)} VODs')
+
+    if vods:
+        if makeThumbnails:
+            thumbnails.generate(vods)
+        journal.extend(vods)
+        print(
+            f'[green]:white_check_mark: Export code saved to [link={os.path.abspath(utils.EXPORT_PATH)}]{utils.EXPORT_PATH}[/]')
+    else:
+        print('[yellow]No VODs processed, skipping export')
@@ -0,0 +1,21 @@
+# Shared setup for the benchmarks, run them from the repository root with: python -m benchmarks.<name>
+
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Where the benchmark was started from, for resolving paths given on the command line
+CWD = os.getcwd()
+
+
+def scratch_dir() -> str:
+    """Importing VODr creates its working files in the current directory, so change to a new scratch directory
+    with a token.txt first. Call this before importing any VODr modules."""
+    if ROOT not in sys.path:
+        sys.path.insert(0, ROOT)
+    path = tempfile.mkdtemp(prefix='vodr-bench-')
+    os.chdir(path)
+    with open('token.txt', 'w') as f:
+        f.write('benchmark')
+    return path
@@ -0,0 +1,149 @@
+# Memory and construction time of the set model for a synthetic 10,000 set bracket
+# Run from the repository root with: python -m benchmarks.bench_model
+
+import json
+import time
+import random
+import tracemalloc
+
+from benchmarks import scratch_dir
+scratch_dir()
+
+import startgg
+
+SETS = 10000
+ENTRANTS = 5000
+CHARACTERS = 80
+GAMES_PER_SET = 3
+# Builds are timed a few times and the fastest is reported, garbage collection makes single runs noisy
+REPEATS = 5
+ROUNDS = ['Winners Round 1', 'Winners Round 2', 'Winners Quarter-Final', 'Winners Semi-Final', 'Winners Final',
+          'Losers Round 1', 'Losers Round 2', 'Losers Quarter-Final', 'Losers Semi-Final', 'Losers Final',
+          'Grand Final', 'Grand Final Reset']
+
+
+class LegacyPlayer:
+    # The dict backed Player from before __slots__, with a list of Character objects built up front
+    def __init__(self, slots, games, videoGame) -> None:
+        self.id = slots['entrant']['id']
+        self.name = slots['entrant']['name']
+        self.videoGame = videoGame
+
+        if games:
+            selections = []
+            for game in games:
+                if game['selections']:
+                    for selection in game['selections']:
+                        char = {'id': selection['entrant']['id'],
+                                'value': selection['selectionValue']}
+                        if char not in selections:
+                            selections.append(char)
+
+            self.characters = [videoGame.get_character(
+                id=s['value']) for s in selections if s['id'] == self.id]
+        else:
+            self.characters = []
+
+
+class LegacySet:
+    p1 = 0
+
+    def __init__(self, data, game) -> None:
+        self.id = data['id']
+        self.videoGame = game
+        self.round = data['fullRoundText']
+        self.roundShort = self.shorten_round(self.round)
+        self.startedAt = data.get('startedAt')
+        self.completedAt = data.get('completedAt')
+        self.station = (data.get('station') or {}).get('number')
+        self.players = [LegacyPlayer(s, data['games'], self.videoGame) for s in data['slots']]
+
+    def shorten_round(self, round: str) -> str:
+        return round.replace(' ', '').replace('-', '').replace('Winners', 'W').replace('Losers', 'L').replace('Quarter', 'Q').replace('Semi', 'S').replace('Grand', 'G').replace('Final', 'F').replace('Round', 'R').replace('Reset', ' Reset')
+
+
+def make_game() -> startgg.VideoGame:
+    # Built by hand instead of downloading the roster
+    game = startgg.VideoGame.__new__(startgg.VideoGame)
+    game.id, game.name = 1, 'Benchmark Game'
+    game.characters = [startgg.Character({'id': i, 'name': f'Character {i}', 'images': [
+        {'id': i, 'width': 64, 'height': 64, 'type': 'stockIcon', 'url': f'https://images.start.gg/{i}.png'}]})
+        for i in range(CHARACTERS)]
+    game.charactersById = {c.id: c for c in game.characters}
+    game.charactersByName = {c.name.casefold(): c for c in game.characters}
+    return game
+
+
+def make_nodes(n: int) -> list[dict]:
+    """Set nodes shaped like the phase query returns them."""
+    rng = random.Random(0)
+    nodes = []
+    for i in range(n):
+        entrants = rng.sample(range(ENTRANTS), 2)
+        mains = {e: rng.randrange(CHARACTERS) for e in entrants}
+        nodes.append({
+            'id': i,
+            'fullRoundText': rng.choice(ROUNDS),
+            'startedAt': 1700000000 + i * 60,
+            'completedAt': 1700000000 + i * 60 + 900,
+            'station': {'number': i % 16 + 1},
+            'games': [{'selections': [{'entrant': {'id': e}, 'selectionValue': mains[e] if rng.random() < 0.8 else rng.randrange(CHARACTERS)}
+                                      for e in entrants]} for _ in range(GAMES_PER_SET)],
+            'slots': [{'entrant': {'id': e, 'name': f'Player {e}'}} for e in entrants],
+        })
+    return nodes
+
+
+def build_legacy(nodes: list[dict], game) -> list:
+    return [LegacySet(n, game) for n in nodes]
+
+
+def build_lazy(nodes: list[dict], game) -> list:
+    return [startgg.Set(n, game) for n in nodes]
+
+
+def build_hydrated(nodes: list[dict], game) -> list:
+    # Every set shown or picked, the worst case for lazy sets
+    sets = [startgg.Set(n, game) for n in nodes]
+    for s in sets:
+        s.players
+    return sets
+
+
+def measure(name: str, build, game: startgg.VideoGame, payload: str) -> tuple[float, int]:
+    """Time building the sets, then build them again under tracemalloc (which slows everything down)
+    to measure what they keep alive once the parsed response is gone."""
+    elapsed = None
+    for _ in range(REPEATS):
+        nodes = json.loads(payload)
+        start = time.perf_counter()
+        sets = build(nodes, game)
+        elapsed = min(elapsed or float('inf'), time.perf_counter() - start)
+        del nodes, sets
+
+    tracemalloc.start()
+    nodes = json.loads(payload)
+    sets = build(nodes, game)
+    del nodes
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print(f'{name:<10} {elapsed * 1000:8.1f} ms  {size / 1024 / 1024:8.2f} MB  {size / len(sets):6.0f} B/set')
+    return elapsed, size
+
+
+def main() -> None:
+    game = make_game()
+    payload = json.dumps(make_nodes(SETS))
+
+    start = time.perf_counter()
+    json.loads(payload)
+    print(f'Building {SETS:,} sets (decoding the response takes {(time.perf_counter() - start) * 1000:.1f} ms)')
+    legacyTime, legacySize = measure('legacy', build_legacy, game, payload)
+    lazyTime, _ = measure('lazy', build_lazy, game, payload)
+    hydratedTime, hydratedSize = measure('hydrated', build_hydrated, game, payload)
+    print(f'Loading: {legacyTime / lazyTime:.1f}x faster, every set hydrated: {legacyTime / hydratedTime:.1f}x faster '
+          f'and {legacySize / hydratedSize:.1f}x smaller')
+
+
+if __name__ == '__main__':
+    main()
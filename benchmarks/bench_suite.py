@@ -0,0 +1,272 @@
+# Benchmarks for the labelling pipeline against a local start.gg stand-in, results are saved as JSON
+# Run from the repository root with: python -m benchmarks.bench_suite [--events 4 --phases 4 --sets 250]
+# Compare with an earlier run (exits with 1 if anything got slower) with: python -m benchmarks.bench_suite --compare old.json
+
+import io
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import argparse
+import statistics
+import subprocess
+import contextlib
+from datetime import datetime, timezone
+
+from benchmarks import ROOT, CWD, scratch_dir
+scratch_dir()
+
+from rich import print
+from rich.table import Table
+
+import utils
+import export
+import startgg
+import templates
+import batch
+from vod import VOD
+from journal import Journal
+from benchmarks.fake_startgg import FakeTournament, FakeStartgg
+
+RESULTS_PATH = os.path.join(ROOT, 'benchmarks', 'results')
+REPEATS = 5
+# Labelled videos for the export and end-to-end benchmarks
+VIDEOS = 500
+# A benchmark counts as a regression when its best time is this much slower than in the compared run
+REGRESSION_THRESHOLD = 1.2
+
+
+def git_version() -> str:
+    try:
+        return subprocess.run(['git', 'describe', '--always', '--dirty'], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+class Suite:
+    server: FakeStartgg
+    link: str
+    repeats: int
+    results: dict[str, dict]
+
+    def __init__(self, server: FakeStartgg, repeats: int = REPEATS) -> None:
+        self.server = server
+        self.link = f'https://start.gg/{server.tournament.tournament["slug"]}'
+        self.repeats = repeats
+        self.results = {}
+
+    def bench(self, name: str, fn, setup=None, **info) -> dict:
+        """Time fn over a few runs. setup runs untimed before each one and its result is passed to fn."""
+        runs = []
+        requests = {}
+        for _ in range(self.repeats):
+            state = setup() if setup else None
+            self.server.reset_counts()
+            start = time.perf_counter()
+            fn(state) if setup else fn()
+            runs.append(time.perf_counter() - start)
+            requests = self.server.reset_counts()
+
+        result = {'best': min(runs), 'median': statistics.median(runs), 'runs': runs, **info}
+        if requests:
+            result['requests'] = requests
+        self.results[name] = result
+        print(f'{name:<24} {result["best"] * 1000:10.1f} ms  (median {result["median"] * 1000:.1f} ms)'
+              + (f'  {sum(requests.values())} requests' if requests else ''))
+        return result
+
+    def tournament(self) -> startgg.Tournament:
+        # Every game is looked up again, so each run downloads its roster like a new session would
+        startgg.VideoGame.catalog.clear()
+        with contextlib.redirect_stdout(io.StringIO()):
+            return startgg.Tournament(utils.parse_link(self.link))
+
+    def loaded(self) -> startgg.Tournament:
+        tournament = self.tournament()
+        tournament.load_sets(quiet=True)
+        return tournament
+
+    def labelled(self, tournament: startgg.Tournament, n: int) -> list[VOD]:
+        sets = [(e, p, s) for e in tournament.events for p in e.phases for s in p.sets][:n]
+        vods = []
+        for i, (e, p, s) in enumerate(sets):
+            vod = VOD(f'Set {i:05d}.mp4')
+            vod.tournament, vod.event, vod.phase, vod.set = tournament, e, p, s
+            vod.templateArgs = templates.TemplateArgs(tournament, e, p, s)
+            vod.title = templates.TITLE.render(vod.templateArgs)
+            vod.description = templates.DESCRIPTION.render(vod.templateArgs)
+            vod.processed = True
+            vods.append(vod)
+        return vods
+
+    def run_api(self) -> None:
+        numSets = self.server.tournament.numSets
+        self.bench('tournament', self.tournament)
+        self.bench('load_sets', lambda t: t.load_sets(quiet=True), self.tournament, sets=numSets)
+
+        def hydrate(tournament: startgg.Tournament) -> None:
+            for e in tournament.events:
+                for p in e.phases:
+                    for s in p.sets:
+                        s.players
+        self.bench('players', hydrate, self.loaded, sets=numSets)
+
+    def run_tree(self) -> None:
+        tournament = self.loaded()
+
+        def cold() -> startgg.Tournament:
+            tournament.phaseTrees, tournament.phaseTreeKeys = {}, {}
+            return tournament
+        self.bench('build_tree', lambda t: t.build_tree(), cold)
+        self.bench('build_tree_warm', tournament.build_tree)
+
+        def fresh() -> startgg.Tournament:
+            tournament.renders = {}
+            return tournament
+        self.bench('render_tree', lambda t: t.full_view(), fresh)
+
+    def run_templates(self, n: int) -> None:
+        tournament = self.loaded()
+        argsList = [v.templateArgs for v in self.labelled(tournament, n)]
+        title, description = templates.TITLE_TEMPLATE, templates.DESCRIPTION_TEMPLATE
+        self.bench('templates.parse', lambda: [(templates.parse(title, a), templates.parse(description, a))
+                                               for a in argsList], videos=len(argsList))
+        self.bench('templates.parse_many', lambda: (templates.parse_many(title, argsList),
+                                                    templates.parse_many(description, argsList)), videos=len(argsList))
+
+    def run_export(self, n: int) -> None:
+        tournament = self.loaded()
+        vods = self.labelled(tournament, n)
+        journal = Journal(utils.JOURNAL_PATH, utils.EXPORT_PATH)
+        entries = {v.filename: journal.entry(v) for v in vods}
+        self.bench('utils.export_code', lambda: utils.export_code(vods), videos=len(vods))
+        self.bench('export.compact', lambda: export.dumps(export.compact(entries)), videos=len(vods))
+
+    def run_end_to_end(self, n: int) -> None:
+        """A headless session: get the tournament, label a manifest of videos and write the journal and export."""
+        tournament = self.loaded()
+        rows = []
+        for ei, e in enumerate(tournament.events):
+            for pi, p in enumerate(e.phases):
+                for si in range(len(p.sets)):
+                    rows.append({batch.FILENAME_FIELD: f'Set {len(rows):05d}.mp4', batch.SET_FIELD: f'{ei}.{pi}.{si}'})
+        rows = rows[:n]
+
+        shutil.rmtree(utils.VIDEOS_PATH)
+        os.mkdir(utils.VIDEOS_PATH)
+        for row in rows:
+            open(os.path.join(utils.VIDEOS_PATH, row[batch.FILENAME_FIELD]), 'w').close()
+        with open('manifest.json', 'w', encoding='utf-8') as f:
+            json.dump(rows, f)
+
+        def setup() -> Journal:
+            startgg.VideoGame.catalog.clear()
+            for path in (utils.JOURNAL_PATH, utils.EXPORT_PATH):
+                if os.path.exists(path):
+                    os.remove(path)
+            return Journal(utils.JOURNAL_PATH, utils.EXPORT_PATH)
+
+        def session(journal: Journal) -> None:
+            with contextlib.redirect_stdout(io.StringIO()):
+                batch.main('manifest.json', self.link, journal)
+        self.bench('end_to_end', session, setup, videos=len(rows))
+
+
+def compare(results: dict, config: dict, previous: dict) -> bool:
+    """Print the change in every benchmark. Returns True if any of them regressed."""
+    table = Table(title=f'Compared with {previous.get("version") or "unknown version"} ({previous.get("timestamp")})')
+    table.add_column('Benchmark')
+    table.add_column('Before', justify='right')
+    table.add_column('After', justify='right')
+    table.add_column('Change', justify='right')
+
+    regressed = False
+    for name, result in results.items():
+        before = previous['results'].get(name)
+        if not before:
+            table.add_row(name, '-', f'{result["best"] * 1000:.1f} ms', 'new')
+            continue
+        ratio = result['best'] / before['best']
+        style = 'red' if ratio > REGRESSION_THRESHOLD else 'green' if ratio < 1 / REGRESSION_THRESHOLD else ''
+        regressed |= ratio > REGRESSION_THRESHOLD
+        table.add_row(name, f'{before["best"] * 1000:.1f} ms', f'{result["best"] * 1000:.1f} ms',
+                      f'[{style}]{ratio:.2f}x[/]' if style else f'{ratio:.2f}x')
+    print(table)
+    if previous.get('config') != config:
+        print('[yellow]The runs used different settings, times may not be comparable')
+    return regressed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Benchmark VODr against a local start.gg stand-in.')
+    parser.add_argument('--events', type=int, default=4)
+    parser.add_argument('--phases', type=int, default=4, help='Phases per event')
+    parser.add_argument('--sets', type=int, default=250, help='Sets per phase')
+    parser.add_argument('--tournament', metavar='PATH',
+                        help='Serve a tournament recorded with "python -m benchmarks.fake_startgg record" instead')
+    parser.add_argument('--videos', type=int, default=VIDEOS, help='Videos labelled by the export and end-to-end benchmarks')
+    parser.add_argument('--latency', type=float, default=0, help='Seconds added to every request')
+    parser.add_argument('--rate-429', type=float, default=0, help='Fraction of requests answered with 429 Too Many Requests')
+    parser.add_argument('--rate-limit', action='store_true',
+                        help="Keep start.gg's rate limit, otherwise requests are only limited by the worker pool")
+    parser.add_argument('--repeats', type=int, default=REPEATS)
+    parser.add_argument('--output', metavar='PATH', help='Where to save the results (default: benchmarks/results/)')
+    parser.add_argument('--compare', metavar='PATH', help='Results of an earlier run to compare with')
+    args = parser.parse_args()
+
+    if args.tournament:
+        tournament = FakeTournament.load(os.path.join(CWD, args.tournament))
+    else:
+        tournament = FakeTournament.generate(args.events, args.phases, args.sets)
+    server = FakeStartgg(tournament, args.latency, args.rate_429)
+    server.start()
+    startgg.API_URL = server.apiUrl
+    startgg.CHARACTER_API_URL = server.characterUrl
+    # Every run downloads everything, cached responses would only measure the disk
+    startgg.responseCache.refresh = True
+    if not args.rate_limit:
+        startgg.limiter.rate = startgg.limiter.capacity = startgg.limiter.tokens = 1e6
+
+    config = {'tournament': args.tournament, 'events': len(tournament.tournament['events']),
+              'phases': sum(len(e['phases']) for e in tournament.tournament['events']),
+              'sets': tournament.numSets, 'videos': args.videos, 'latency': args.latency,
+              'rate429': args.rate_429, 'rateLimit': args.rate_limit, 'repeats': args.repeats}
+    print(f'[white]Benchmarking {config["sets"]:,} sets in {config["phases"]} phases of {config["events"]} events')
+
+    suite = Suite(server, args.repeats)
+    try:
+        suite.run_api()
+        suite.run_tree()
+        suite.run_templates(args.videos)
+        suite.run_export(args.videos)
+        suite.run_end_to_end(args.videos)
+    finally:
+        server.stop()
+
+    results = {'version': git_version(),
+               'python': platform.python_version(),
+               'platform': platform.platform(),
+               'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+               'config': config,
+               'results': suite.results}
+    if args.output:
+        path = os.path.join(CWD, args.output)
+    else:
+        os.makedirs(RESULTS_PATH, exist_ok=True)
+        path = os.path.join(RESULTS_PATH, f'{datetime.now():%Y%m%d-%H%M%S}.json')
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f'[green]Results saved to {path}')
+
+    if args.compare:
+        with open(os.path.join(CWD, args.compare), 'r', encoding='utf-8') as f:
+            previous = json.load(f)
+        if compare(suite.results, config, previous):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+# Micro-benchmark for rendering titles and descriptions
+# Run from the repository root with: python -m benchmarks.bench_templates
+
+import time
+import re
+
+from benchmarks import scratch_dir
+scratch_dir()
+
+import templates
+
+RENDERS = 10000
+
+
+def legacy_parse(template: str, args: templates.TemplateArgs) -> str:
+    # The chained str.replace implementation templates.parse used before templates were compiled
+    return re.sub(r' +', ' ', template.replace(templates.TOURNAMENT_SHORT, args.tournamentShort).replace(templates.TOURNAMENT_NAME, args.tournamentName).replace(templates.TOURNAMENT_LINK, args.tournamentLink).replace(templates.EVENT_NAME, args.eventName).replace(templates.PHASE_NAME, args.phaseName).replace(templates.GAME, args.game).replace(templates.ROUND_FULL, args.roundFull).replace(templates.ROUND_SHORT, args.roundShort).replace(templates.PLAYER_1_CHARS, args.player1Chars).replace(templates.PLAYER_2_CHARS, args.player2Chars).replace(templates.PLAYER_1, args.player1).replace(templates.PLAYER_2, args.player2))
+
+
+def make_args(n: int) -> list[templates.TemplateArgs]:
+    argsList = []
+    for i in range(n):
+        # Skip __init__, the class defaults are realistic values
+        args = templates.TemplateArgs.__new__(templates.TemplateArgs)
+        args.player1 = f'Player {i}'
+        args.player2 = f'Player {i + 1}'
+        argsList.append(args)
+    return argsList
+
+
+def bench(name: str, fn) -> float:
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    print(f'{name:<24} {elapsed * 1000:8.1f} ms  {RENDERS * 2 / elapsed:12,.0f} renders/s')
+    return elapsed
+
+
+def main() -> None:
+    argsList = make_args(RENDERS)
+    title = templates.TITLE_TEMPLATE
+    description = templates.DESCRIPTION_TEMPLATE
+
+    assert [legacy_parse(title, a) for a in argsList] == templates.parse_many(title, argsList)
+
+    print(f'Rendering {RENDERS:,} titles and descriptions')
+    legacy = bench('chained replace', lambda: [(legacy_parse(title, a), legacy_parse(description, a)) for a in argsList])
+    bench('compiled render', lambda: [(templates.TITLE.render(a), templates.DESCRIPTION.render(a)) for a in argsList])
+    batch = bench('compiled render_many', lambda: (templates.TITLE.render_many(argsList), templates.DESCRIPTION.render_many(argsList)))
+    print(f'Speedup (batch): {legacy / batch:.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,227 @@
+# Local stand-in for the start.gg GraphQL API and the characters endpoint, used by the benchmarks
+# Serves a synthetic tournament of any size, or one recorded from the real API, with optional latency and 429s
+#
+# Record a real tournament with: python -m benchmarks.fake_startgg record <start.gg link> tournament.json
+# (needs token.txt in the current directory)
+
+import re
+import json
+import time
+import random
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Everything in the synthetic tournament happens after this
+BASE_TIME = 1700000000
+ROUNDS = ['Winners Round 1', 'Winners Round 2', 'Winners Quarter-Final', 'Winners Semi-Final', 'Winners Final',
+          'Losers Round 1', 'Losers Round 2', 'Losers Quarter-Final', 'Losers Semi-Final', 'Losers Final',
+          'Grand Final', 'Grand Final Reset']
+CHARACTERS = 80
+GAMES_PER_SET = 3
+
+ALIAS_REGEX = re.compile(r'(\w+):\s*phase\(id:\s*(\d+)\)\s*\{\s*sets\(([^)]*)\)')
+# page: 1, perPage: 33, sortType: CALL_ORDER, filters: {updatedAfter: 1700000000}
+ARGUMENT_REGEX = re.compile(r'(\w+):\s*\{?\s*(?:updatedAfter:\s*)?(\w+)')
+
+
+class FakeTournament:
+    """Responses for one tournament: the tournament query, the set nodes of each phase and each game's characters."""
+    tournament: dict
+    sets: dict[int, list[dict]]
+    characters: dict[int, list[dict]]
+
+    def __init__(self, tournament: dict, sets: dict[int, list[dict]], characters: dict[int, list[dict]]) -> None:
+        self.tournament = tournament
+        self.sets = sets
+        self.characters = characters
+        # Sets report when they were last updated, all at the start unless a benchmark changes them
+        self.updatedAt = {s['id']: BASE_TIME for nodes in sets.values() for s in nodes}
+
+    @property
+    def numSets(self) -> int:
+        return sum(len(nodes) for nodes in self.sets.values())
+
+    @classmethod
+    def generate(cls, events: int = 4, phases: int = 4, sets: int = 250, seed: int = 0) -> 'FakeTournament':
+        """A completed tournament with events x phases x sets sets, two entrants per set and a few games each."""
+        rng = random.Random(seed)
+        game = {'id': 1, 'name': 'Benchmark Game'}
+        characters = [{'id': i, 'name': f'Character {i}', 'slug': f'character-{i}', 'images': [
+            {'id': i, 'width': 64, 'height': 64, 'type': 'stockIcon', 'url': f'https://images.start.gg/stock/{i}.png'}]}
+            for i in range(1, CHARACTERS + 1)]
+
+        eventData = []
+        phaseSets = {}
+        for e in range(events):
+            phaseData = []
+            for p in range(phases):
+                phaseId = (e + 1) * 1000 + p
+                entrants = max(2, sets // 2 + 1)
+                nodes = []
+                for i in range(sets):
+                    pair = rng.sample(range(entrants), 2)
+                    ids = [phaseId * 10000 + x for x in pair]
+                    mains = {id: rng.randrange(1, CHARACTERS + 1) for id in ids}
+                    started = BASE_TIME + (e * phases + p) * 86400 + i * 300
+                    nodes.append({
+                        'id': phaseId * 10000 + i,
+                        'fullRoundText': ROUNDS[i % len(ROUNDS)],
+                        'startedAt': started,
+                        'completedAt': started + rng.randrange(600, 1500),
+                        'station': {'number': i % 16 + 1},
+                        'games': [{'selections': [{'entrant': {'id': id},
+                                                   'selectionValue': mains[id] if rng.random() < 0.8 else rng.randrange(1, CHARACTERS + 1)}
+                                                  for id in ids]} for _ in range(GAMES_PER_SET)],
+                        'slots': [{'entrant': {'id': id, 'name': f'Sponsor | Player {x}' if x % 5 == 0 else f'Player {x}'}}
+                                  for id, x in zip(ids, pair)],
+                    })
+                phaseSets[phaseId] = nodes
+                phaseData.append({'id': phaseId, 'name': f'Phase {p + 1}', 'state': 'COMPLETED',
+                                  'numSeeds': entrants, 'sets': {'pageInfo': {'total': sets}}})
+            eventData.append({'name': f'Event {e + 1}', 'videogame': game, 'phases': phaseData})
+
+        tournament = {'name': 'Benchmark Major', 'slug': 'tournament/benchmark-major', 'shortSlug': 'bm',
+                      'url': '/tournament/benchmark-major', 'state': 3, 'events': eventData}
+        return cls(tournament, phaseSets, {game['id']: characters})
+
+    @classmethod
+    def load(cls, path: str) -> 'FakeTournament':
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return cls(data['tournament'], {int(k): v for k, v in data['sets'].items()},
+                   {int(k): v for k, v in data['characters'].items()})
+
+    def save(self, path: str) -> None:
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'tournament': self.tournament, 'sets': self.sets, 'characters': self.characters}, f)
+
+    def page(self, phaseId: int, page: int, perPage: int, updatedAfter: int = None) -> dict:
+        nodes = self.sets.get(phaseId, [])
+        if updatedAfter is not None:
+            nodes = [n for n in nodes if self.updatedAt[n['id']] > updatedAfter]
+        return {'nodes': nodes[(page - 1) * perPage:page * perPage]}
+
+
+class FakeHandler(BaseHTTPRequestHandler):
+    server: 'FakeStartgg'
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+    def send_json(self, body: dict, status: int = 200) -> None:
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def throttled(self) -> bool:
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        if self.server.rng.random() < self.server.rate429:
+            self.server.count('throttled')
+            self.send_response(429)
+            self.send_header('Retry-After', str(self.server.retryAfter))
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return True
+        return False
+
+    def do_GET(self) -> None:
+        self.server.count('characters')
+        if self.throttled():
+            return
+        m = re.search(r'videogameId=(\d+)', self.path)
+        characters = self.server.tournament.characters.get(int(m.group(1))) if m else None
+        self.send_json({'entities': {'character': characters}} if characters else {'entities': {}})
+
+    def do_POST(self) -> None:
+        self.server.count('graphql')
+        if self.throttled():
+            return
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        query = body['query']
+
+        if 'tournament(' in query:
+            return self.send_json({'data': {'tournament': self.server.tournament.tournament}})
+
+        data = {}
+        for alias, phaseId, args in ALIAS_REGEX.findall(query):
+            args = dict(ARGUMENT_REGEX.findall(args))
+            data[alias] = {'sets': self.server.tournament.page(int(phaseId), int(args['page']), int(args['perPage']),
+                                                              int(args['filters']) if 'filters' in args else None)}
+        if not data:
+            return self.send_json({'errors': [{'message': 'Unknown query'}], 'data': None})
+        self.send_json({'data': data})
+
+
+class FakeStartgg(ThreadingHTTPServer):
+    daemon_threads = True
+    tournament: FakeTournament
+    latency: float
+    rate429: float
+    counts: dict[str, int]
+
+    def __init__(self, tournament: FakeTournament, latency: float = 0, rate429: float = 0,
+                 retryAfter: int = 1, port: int = 0, seed: int = 0) -> None:
+        """latency is added to every request in seconds, rate429 is the fraction of requests answered with a 429."""
+        super().__init__(('127.0.0.1', port), FakeHandler)
+        self.tournament = tournament
+        self.latency = latency
+        self.rate429 = rate429
+        self.retryAfter = retryAfter
+        self.rng = random.Random(seed)
+        self.counts = {}
+        self.lock = threading.Lock()
+        self.thread = threading.Thread(target=self.serve_forever, name='fake-startgg', daemon=True)
+
+    @property
+    def apiUrl(self) -> str:
+        return f'http://127.0.0.1:{self.server_port}/gql/alpha'
+
+    @property
+    def characterUrl(self) -> str:
+        return f'http://127.0.0.1:{self.server_port}/characters?videogameId='
+
+    def count(self, name: str) -> None:
+        with self.lock:
+            self.counts[name] = self.counts.get(name, 0) + 1
+
+    def reset_counts(self) -> dict[str, int]:
+        with self.lock:
+            counts, self.counts = self.counts, {}
+        return counts
+
+    def start(self) -> None:
+        self.thread.start()
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+
+def record(link: str, path: str) -> None:
+    """Save a real tournament's responses so it can be served by FakeStartgg."""
+    import utils
+    import startgg
+
+    slug = utils.parse_link(link)
+    data = startgg.client.query(startgg.API_URL, startgg.Tournament.QUERY, {'slug': slug}, name='tournament')['tournament']
+    tournament = startgg.Tournament(slug)
+    phases = [p for e in tournament.events for p in e.phases]
+    sets = {p.id: nodes for p, nodes in startgg.fetch_sets(phases).items()}
+    characters = {}
+    for e in data['events']:
+        id = e['videogame']['id']
+        if id not in characters:
+            characters[id] = startgg.client.get(f'{startgg.CHARACTER_API_URL}{id}', name='characters')['entities']['character']
+    FakeTournament(data, sets, characters).save(path)
+
+
+if __name__ == '__main__':
+    import sys
+    if len(sys.argv) != 4 or sys.argv[1] != 'record':
+        print('Usage: python -m benchmarks.fake_startgg record <start.gg link> <output.json>')
+        sys.exit(1)
+    record(sys.argv[2], sys.argv[3])
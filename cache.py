@@ -0,0 +1,180 @@
+# Persistent on-disk caches for start.gg API responses and data read from video files
+
+import os
+import json
+import time
+import hashlib
+import threading
+
+# Entries for anything still in progress are only trusted for a few minutes
+IN_PROGRESS_TTL = 5 * 60
+# Character rosters only change with game updates
+CHARACTER_TTL = 7 * 24 * 60 * 60
+# Upper bound for the whole cache directory, oldest entries are evicted first
+MAX_CACHE_SIZE = 64 * 1024 * 1024
+# Eviction frees some room below the limit, so a full cache isn't scanned again on every write
+EVICT_TO = 0.9
+
+
+class ResponseCache:
+    path: str
+    maxSize: int
+    refresh: bool = False
+    # Running total of the entry sizes, None until the directory is first scanned
+    size: int = None
+
+    def __init__(self, path: str, maxSize: int = MAX_CACHE_SIZE) -> None:
+        self.path = path
+        self.maxSize = maxSize
+        self.sizeLock = threading.Lock()
+        if not os.path.exists(self.path):
+            os.mkdir(self.path)
+
+    def key(self, query: str, variables: dict = None) -> str:
+        raw = json.dumps({'query': query, 'variables': variables or {}}, sort_keys=True)
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def entry_path(self, key: str) -> str:
+        return os.path.join(self.path, f'{key}.json')
+
+    def get(self, query: str, variables: dict = None):
+        # --refresh skips reads but still writes, so the cache is repopulated with fresh data
+        if self.refresh:
+            return None
+
+        path = self.entry_path(self.key(query, variables))
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if entry['expires'] is not None and entry['expires'] < time.time():
+            self.remove(path)
+            return None
+
+        # Bump the access time so eviction drops the least recently used entries first
+        os.utime(path)
+        return entry['data']
+
+    def set(self, query: str, variables: dict, data, ttl: float = None) -> None:
+        """Store a response. A ttl of None means the entry never expires."""
+        path = self.entry_path(self.key(query, variables))
+        entry = {'expires': time.time() + ttl if ttl is not None else None,
+                 'data': data}
+
+        # Write to a temporary file first so an interrupted run never leaves a truncated entry
+        tmp = f'{path}.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(entry, f)
+        size = os.path.getsize(tmp)
+        try:
+            size -= os.path.getsize(path)
+        except OSError:
+            pass
+        os.replace(tmp, path)
+
+        self.grow(size)
+
+    def grow(self, delta: int) -> None:
+        # The directory is only scanned when its size isn't known yet or the cache has grown past the limit
+        with self.sizeLock:
+            if self.size is not None:
+                self.size += delta
+                if self.size <= self.maxSize:
+                    return
+        self.evict()
+
+    def remove(self, path: str) -> None:
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+        except OSError:
+            return
+        with self.sizeLock:
+            if self.size is not None:
+                self.size -= size
+
+    def evict(self) -> None:
+        entries = []
+        total = 0
+        with os.scandir(self.path) as it:
+            for e in it:
+                if not e.is_file() or not e.name.endswith('.json'):
+                    continue
+                try:
+                    stat = e.stat()
+                except OSError:
+                    # Removed by another thread while scanning
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, e.path))
+                total += stat.st_size
+
+        if total > self.maxSize:
+            for _, size, path in sorted(entries):
+                self.remove(path)
+                total -= size
+                if total <= self.maxSize * EVICT_TO:
+                    break
+
+        with self.sizeLock:
+            self.size = total
+
+    def clear(self) -> None:
+        with os.scandir(self.path) as it:
+            for e in it:
+                if e.is_file():
+                    self.remove(e.path)
+        with self.sizeLock:
+            self.size = 0
+
+
+class FileCache:
+    """Values computed from video files, stored in one JSON file and keyed by path, size and modification time."""
+    path: str
+    entries: dict[str, dict]
+    dirty: bool = False
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.lock = threading.Lock()
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def stat_key(self, path: str) -> tuple[str, int, int]:
+        stat = os.stat(path)
+        return os.path.abspath(path), stat.st_size, stat.st_mtime_ns
+
+    def get(self, path: str):
+        """Return the cached value for a file, or None if there is none or the file changed since."""
+        try:
+            name, size, mtime = self.stat_key(path)
+        except OSError:
+            return None
+        entry = self.entries.get(name)
+        if entry and entry['size'] == size and entry['mtime'] == mtime:
+            return entry['value']
+        return None
+
+    def set(self, path: str, value) -> None:
+        try:
+            name, size, mtime = self.stat_key(path)
+        except OSError:
+            return
+        with self.lock:
+            self.entries[name] = {'size': size, 'mtime': mtime, 'value': value}
+            self.dirty = True
+
+    def save(self) -> None:
+        with self.lock:
+            if not self.dirty:
+                return
+            tmp = f'{self.path}.tmp'
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(self.entries, f)
+            os.replace(tmp, self.path)
+            self.dirty = False
@@ -0,0 +1,246 @@
+# Find videos in the video folders and watch them for new recordings
+
+import os
+import re
+import sys
+import time
+import queue
+import struct
+import select
+import threading
+from rich.table import Table
+
+import utils
+from vod import VOD
+
+VIDEO_REGEX = re.compile(utils.VIDEO_FORMAT_REGEX, re.I)
+# Station folders are named after their station number, like "Station 3" or "3"
+STATION_REGEX = re.compile(r'(\d+)')
+
+# How often watched files are checked, and how long their size has to stay the same before they're added
+POLL_INTERVAL = 2
+SETTLE_TIME = 10
+
+# inotify(7) flags and event header
+IN_MODIFY = 0x2
+IN_CLOSE_WRITE = 0x8
+IN_MOVED_TO = 0x80
+IN_CREATE = 0x100
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+EVENT_HEADER = struct.Struct('iIII')
+
+
+def station_number(root: str, path: str) -> int:
+    """The station a video belongs to, from the first folder below its root."""
+    parts = os.path.relpath(os.path.dirname(path), root).split(os.sep)
+    if parts[0] == os.curdir:
+        return None
+    m = STATION_REGEX.search(parts[0])
+    return int(m.group(1)) if m else None
+
+
+def make_vod(root: str, path: str) -> VOD:
+    return VOD(os.path.basename(path), path, station_number(root, path))
+
+
+def scan_dir(path: str):
+    """Yield (directory, entry) for every file below path. Hidden folders are skipped."""
+    stack = [path]
+    while stack:
+        dir = stack.pop()
+        try:
+            with os.scandir(dir) as it:
+                for e in it:
+                    if e.is_dir(follow_symlinks=False):
+                        if not e.name.startswith('.'):
+                            stack.append(e.path)
+                    elif e.is_file():
+                        yield dir, e
+        except OSError:
+            # Removed or not readable, a capture card may be unplugged mid scan
+            continue
+
+
+def scan(roots: list[str]):
+    """Yield (root, path) for every video below the roots."""
+    for root in roots:
+        for _, e in scan_dir(root):
+            if VIDEO_REGEX.match(e.name):
+                yield root, e.path
+
+
+def discover(roots: list[str]) -> list[VOD]:
+    return sorted((make_vod(root, path) for root, path in scan(roots)), key=lambda v: v.path)
+
+
+def name_clashes(vods: list[VOD]) -> dict[str, list[VOD]]:
+    """Videos in different folders with the same filename. The userscript only sees filenames, so it can't tell them apart."""
+    byName = {}
+    for vod in vods:
+        byName.setdefault(vod.filename, []).append(vod)
+    return {name: group for name, group in byName.items() if len(group) > 1}
+
+
+def name_clash_table(clashes: dict[str, list[VOD]]):
+    table = Table(title='[red]Videos with the same filename', expand=False)
+    table.add_column('Filename')
+    table.add_column('Paths', style='red')
+    for name, group in clashes.items():
+        table.add_row(name, '\n'.join(v.path for v in group))
+    return table
+
+
+class Inotify:
+    """Minimal inotify binding, used to hear about new files without rescanning every folder."""
+
+    def __init__(self) -> None:
+        import ctypes
+        import ctypes.util
+        self.libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        self.dirs = {}
+
+    def add(self, path: str) -> None:
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), WATCH_MASK)
+        if wd >= 0:
+            self.dirs[wd] = path
+
+    def add_tree(self, path: str) -> None:
+        for dir, subdirs, _ in os.walk(path):
+            subdirs[:] = [d for d in subdirs if not d.startswith('.')]
+            self.add(dir)
+
+    def read(self, timeout: float):
+        """Yield (path, is directory) for each event within the timeout."""
+        if not select.select([self.fd], [], [], timeout)[0]:
+            return
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return
+        pos = 0
+        while pos < len(data):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(data, pos)
+            pos += EVENT_HEADER.size
+            name = data[pos:pos + length].rstrip(b'\0')
+            pos += length
+            if wd in self.dirs and name:
+                yield os.path.join(self.dirs[wd], os.fsdecode(name)), bool(mask & IN_ISDIR)
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+class Watcher:
+    """Watches the video folders in a background thread and queues new videos once they are done being written."""
+    roots: list[str]
+    known: set[str]
+    pending: dict[str, tuple[str, int, float]]
+    queue: queue.Queue
+
+    def __init__(self, roots: list[str], known: list[str]) -> None:
+        self.roots = roots
+        self.known = {os.path.abspath(p) for p in known}
+        self.pending = {}
+        self.queue = queue.Queue()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, name='watcher', daemon=True)
+
+        self.inotify = None
+        if sys.platform.startswith('linux'):
+            try:
+                self.inotify = Inotify()
+                for root in self.roots:
+                    self.inotify.add_tree(root)
+            except (OSError, AttributeError):
+                # No inotify (or out of watches), fall back to polling
+                self.inotify = None
+
+    def start(self) -> None:
+        self.thread.start()
+
+    def stop(self) -> None:
+        self.stopped.set()
+
+    def root_of(self, path: str) -> str:
+        path = os.path.abspath(path)
+        return next((r for r in self.roots if os.path.commonpath([os.path.abspath(r), path]) == os.path.abspath(r)), self.roots[0])
+
+    def notice(self, root: str, path: str) -> None:
+        if os.path.abspath(path) not in self.known and path not in self.pending and VIDEO_REGEX.match(path):
+            self.pending[path] = (root, -1, time.monotonic())
+
+    def settle(self) -> None:
+        """Queue pending files whose size hasn't changed for SETTLE_TIME."""
+        now = time.monotonic()
+        for path, (root, size, since) in [*self.pending.items()]:
+            try:
+                current = os.path.getsize(path)
+            except OSError:
+                del self.pending[path]
+                continue
+            if current != size:
+                self.pending[path] = (root, current, now)
+            elif now - since >= SETTLE_TIME:
+                del self.pending[path]
+                self.known.add(os.path.abspath(path))
+                self.queue.put(make_vod(root, path))
+
+    def run(self) -> None:
+        # Catch anything that arrived between the first scan and the watches being set up
+        for root, path in scan(self.roots):
+            self.notice(root, path)
+
+        while not self.stopped.is_set():
+            if self.inotify:
+                for path, isDir in self.inotify.read(POLL_INTERVAL):
+                    if isDir:
+                        # Pick up folders created for a new station, and anything copied in with them
+                        self.inotify.add_tree(path)
+                        for _, e in scan_dir(path):
+                            self.notice(self.root_of(path), e.path)
+                    else:
+                        self.notice(self.root_of(path), path)
+            else:
+                for root, path in scan(self.roots):
+                    self.notice(root, path)
+                self.stopped.wait(POLL_INTERVAL)
+            self.settle()
+
+        if self.inotify:
+            self.inotify.close()
+
+    def get(self, timeout: float = None) -> VOD:
+        """The next new video, or None if there is none within the timeout."""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def drain(self) -> list[VOD]:
+        vods = []
+        while (vod := self.get(0)) is not None:
+            vods.append(vod)
+        return vods
+
+
+if __name__ == '__main__':
+    from rich import print
+    roots = sys.argv[1:] or [utils.VIDEOS_PATH]
+    vods = discover(roots)
+    for vod in vods:
+        print(vod.station, vod.path)
+    watcher = Watcher(roots, [v.path for v in vods])
+    print(f'Watching with {"inotify" if watcher.inotify else "polling"}, Ctrl+C to stop')
+    watcher.start()
+    try:
+        while True:
+            vod = watcher.get()
+            print('New video:', vod.station, vod.path)
+    except KeyboardInterrupt:
+        watcher.stop()
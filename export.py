@@ -0,0 +1,116 @@
+# Compact export format. The templates and every distinct value are stored once, each video only holds
+# references to them and the userscript renders the titles and descriptions.
+#
+# {"version": 2,
+#  "fields": ["tournamentName", ...],
+#  "templates": {"title": ["text", 0, " ", 3, ...], "description": [...]},
+#  "values": ["LoL60", ...],
+#  "vods": {"file.mp4": [1, 0, ...]}}
+#
+# Templates are literal text and indexes into fields. Each video has an index into values for every field,
+# followed by one for its thumbnail if it has one. Videos whose title or description didn't come from the
+# current templates (labelled in an earlier session with other templates) keep the old form,
+# {"title": ..., "description": ...}. Old exports are a plain object of those, without a version.
+
+import json
+from types import SimpleNamespace
+
+import templates
+
+EXPORT_VERSION = 2
+FIELDS = [*dict.fromkeys(templates.PLACEHOLDERS.values())]
+
+
+def compact_template(template: templates.Template) -> list:
+    parts = []
+    for text, field in template.tokens:
+        if text is None:
+            parts.append(FIELDS.index(field))
+        elif parts and isinstance(parts[-1], str):
+            parts[-1] += text
+        else:
+            parts.append(text)
+    return parts
+
+
+def compact(entries: dict[str, dict]) -> dict:
+    """Build a compact export from journal entries."""
+    values = {}
+    vods = {}
+    for entry in entries.values():
+        filename = entry['filename']
+        export = entry['export']
+        try:
+            args = SimpleNamespace(**{k: templates.field_value(v) for k, v in entry['args'].items()})
+            rendered = (templates.TITLE.render(args) == export['title']
+                        and templates.DESCRIPTION.render(args) == export['description'])
+        except (AttributeError, KeyError, TypeError):
+            rendered = False
+        if not rendered:
+            vods[filename] = export
+            continue
+
+        refs = [values.setdefault(getattr(args, f), len(values)) for f in FIELDS]
+        if export.get('thumbnail'):
+            refs.append(values.setdefault(export['thumbnail'], len(values)))
+        vods[filename] = refs
+
+    return {'version': EXPORT_VERSION,
+            'fields': FIELDS,
+            'templates': {'title': compact_template(templates.TITLE),
+                          'description': compact_template(templates.DESCRIPTION)},
+            'values': [*values],
+            'vods': vods}
+
+
+def render(template: list, refs: list[int], values: list[str]) -> str:
+    text = ''.join(values[refs[p]] if isinstance(p, int) else p for p in template)
+    return templates.COLLAPSE_WS_REGEX.sub(' ', text)
+
+
+def expand(data: dict) -> dict[str, dict]:
+    """The export as filename -> {"title", "description"}, from either format. The userscript does the same."""
+    if 'version' not in data:
+        return data
+
+    expanded = {}
+    for filename, entry in data['vods'].items():
+        if isinstance(entry, dict):
+            expanded[filename] = entry
+            continue
+        expanded[filename] = {'title': render(data['templates']['title'], entry, data['values']),
+                              'description': render(data['templates']['description'], entry, data['values'])}
+        if len(entry) > len(data['fields']):
+            expanded[filename]['thumbnail'] = data['values'][entry[len(data['fields'])]]
+    return expanded
+
+
+def dumps(data: dict) -> str:
+    return json.dumps(data, separators=(',', ':'))
+
+
+if __name__ == '__main__':
+    import sys
+    import gzip
+    from rich import print
+    from rich.table import Table
+
+    import utils
+    from journal import Journal
+
+    # python export.py [journal.jsonl], compares both formats for a session
+    journal = Journal(sys.argv[1] if len(sys.argv) > 1 else utils.JOURNAL_PATH, utils.EXPORT_PATH)
+    entries = journal.read()
+    full = {entry['filename']: entry['export'] for entry in entries.values()}
+    compacted = compact(entries)
+    assert expand(compacted) == full, 'compact export does not expand to the full export'
+
+    table = Table(title=f'Export size for {len(entries)} videos')
+    table.add_column('Format')
+    table.add_column('Bytes', justify='right')
+    table.add_column('Gzipped', justify='right')
+    for name, code in (('Full', json.dumps(full)), ('Compact', dumps(compacted))):
+        data = code.encode('utf-8')
+        table.add_row(name, f'{len(data):,}', f'{len(gzip.compress(data)):,}')
+    print(table)
+    print(f'{sum(1 for v in compacted["vods"].values() if isinstance(v, dict))} videos stored in full')
@@ -0,0 +1,96 @@
+# Find copies of the same video by hashing a few samples of each file instead of the whole thing
+
+import os
+import mmap
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from rich import print
+from rich.table import Table
+
+import utils
+from cache import FileCache
+from vod import VOD
+
+SAMPLE_SIZE = 256 * 1024
+# Samples spread evenly between the head and tail
+STRIDES = 6
+FINGERPRINT_WORKERS = 4
+
+fingerprintCache = FileCache(os.path.join(utils.FILE_CACHE_PATH, 'fingerprints.json'))
+
+
+def fingerprint_file(path: str) -> str:
+    """Hash the size, head, tail and a few evenly spaced chunks of a file. Empty files have no fingerprint."""
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if not size:
+            return None
+        h.update(size.to_bytes(8, 'little'))
+        if size <= SAMPLE_SIZE * (STRIDES + 2):
+            h.update(f.read())
+            return h.hexdigest()
+
+        # Only the sampled pages are read from disk
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+            step = (size - SAMPLE_SIZE) // (STRIDES + 1)
+            for i in range(STRIDES + 2):
+                start = i * step if i <= STRIDES else size - SAMPLE_SIZE
+                h.update(m[start:start + SAMPLE_SIZE])
+    return h.hexdigest()
+
+
+def fingerprint(vod: VOD) -> str:
+    value = fingerprintCache.get(vod.path)
+    if value is None:
+        try:
+            value = fingerprint_file(vod.path)
+        except OSError:
+            return None
+        if value is not None:
+            fingerprintCache.set(vod.path, value)
+    return value
+
+
+class DuplicateFilter:
+    """Keeps the first video of each group of copies, remembering the rest so they can be listed."""
+    seen: dict[str, VOD]
+    duplicates: dict[VOD, list[VOD]]
+
+    def __init__(self) -> None:
+        self.seen = {}
+        self.duplicates = {}
+
+    def filter(self, vods: list[VOD]) -> list[VOD]:
+        """Return the videos that aren't copies of one already seen."""
+        with ThreadPoolExecutor(max_workers=FINGERPRINT_WORKERS) as pool:
+            fingerprints = [*pool.map(fingerprint, vods)]
+        fingerprintCache.save()
+
+        unique = []
+        for vod, fp in zip(vods, fingerprints):
+            if fp is None:
+                unique.append(vod)
+            elif fp in self.seen:
+                self.duplicates.setdefault(self.seen[fp], []).append(vod)
+            else:
+                self.seen[fp] = vod
+                unique.append(vod)
+        return unique
+
+    def summary_table(self):
+        table = Table(title='[yellow]Duplicate videos', expand=False)
+        table.add_column('Labelled')
+        table.add_column('Copies (skipped)', style='yellow')
+        for vod, copies in self.duplicates.items():
+            table.add_row(vod.path, '\n'.join(c.path for c in copies))
+        return table
+
+
+if __name__ == '__main__':
+    import sys
+    from discovery import discover
+    vods = discover(sys.argv[1:] or [utils.VIDEOS_PATH])
+    duplicates = DuplicateFilter()
+    print(f'{len(duplicates.filter(vods))} unique of {len(vods)} videos')
+    print(duplicates.summary_table())
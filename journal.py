@@ -0,0 +1,136 @@
+# Append-only journal of labelled VODs, so a session survives crashes and can be resumed
+
+import os
+import json
+
+import export
+import profiling
+from vod import VOD
+
+
+def entry_key(entry: dict) -> str:
+    # Entries are keyed by the video's path, entries written before paths were stored only have the filename
+    return entry.get('path') or entry['filename']
+
+
+def entry_tournament(entry: dict) -> str:
+    # Older entries only have the tournament link, https://start.gg/tournament/<slug>
+    if entry.get('tournament'):
+        return entry['tournament']
+    link = (entry.get('args') or {}).get('tournamentLink') or ''
+    return link[link.find('tournament/'):] if 'tournament/' in link else None
+
+
+class Journal:
+    path: str
+    exportPath: str
+    # Entries by video path, the export is keyed by filename because that is all the userscript can see
+    entries: dict[str, dict]
+
+    def __init__(self, path: str, exportPath: str) -> None:
+        self.path = path
+        self.exportPath = exportPath
+        self.entries = {}
+
+    def read(self) -> dict[str, dict]:
+        """Read every entry from the journal."""
+        entries = {}
+        if os.path.exists(self.path):
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # A crash in the middle of a write leaves a truncated last line
+                        continue
+                    # Relabelling a video appends a new entry, the last one wins
+                    entries[entry_key(entry)] = entry
+        self.entries = entries
+        return self.entries
+
+    def load(self) -> dict[str, dict]:
+        """Read every entry from the journal and bring the export file up to date with it."""
+        self.read()
+        self.write_export()
+        return self.entries
+
+    @staticmethod
+    def key(vod: VOD) -> str:
+        return os.path.abspath(vod.path)
+
+    def labelled(self, vod: VOD) -> bool:
+        return self.key(vod) in self.entries or vod.filename in self.entries
+
+    def entry(self, vod: VOD) -> dict:
+        return {'filename': vod.filename,
+                'path': self.key(vod),
+                'tournament': vod.tournament.slug if vod.tournament else None,
+                'export': vod.export_dict()[vod.filename],
+                'args': vars(vod.templateArgs)}
+
+    @profiling.timed('export.journal')
+    def append(self, vod: VOD) -> None:
+        entry = self.entry(vod)
+        self.write_entries([entry])
+        self.append_export(entry)
+
+    @profiling.timed('export.journal')
+    def extend(self, vods: list[VOD]) -> None:
+        """Journal many VODs at once, with a single sync and export rewrite."""
+        entries = [self.entry(v) for v in vods]
+        self.write_entries(entries)
+        self.write_export()
+
+    def write_entries(self, entries: list[dict]) -> None:
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(''.join(json.dumps(e) + '\n' for e in entries))
+            f.flush()
+            os.fsync(f.fileno())
+        for entry in entries:
+            self.entries[entry_key(entry)] = entry
+
+    def append_export(self, entry: dict) -> None:
+        if not os.path.exists(self.exportPath):
+            self.write_export()
+            return
+
+        # Insert the new key before the closing brace instead of rewriting the whole file.
+        # A relabelled video ends up as a duplicate key, and JSON parsers keep the last one
+        item = f'{json.dumps(entry["filename"])}: {json.dumps(entry["export"])}}}'.encode('utf-8')
+        with open(self.exportPath, 'r+b') as f:
+            end = f.seek(0, os.SEEK_END)
+            f.seek(end - 1)
+            f.write(item if end <= 2 else b', ' + item)
+
+    def write_export(self) -> None:
+        with open(self.exportPath, 'w', encoding='utf-8') as f:
+            f.write('{')
+            for i, entry in enumerate(self.entries.values()):
+                if i:
+                    f.write(', ')
+                f.write(f'{json.dumps(entry["filename"])}: {json.dumps(entry["export"])}')
+            f.write('}')
+
+    @profiling.timed('export.code')
+    def export_code(self) -> str:
+        """The export code for the clipboard, in the compact format."""
+        if not self.entries:
+            return ''
+        return export.dumps(export.compact(self.entries))
+
+    def set_aside(self, slug: str) -> int:
+        """Move entries for other tournaments to the backup journal, so last week's session isn't resumed or exported
+        with this one. Returns how many were moved."""
+        entries = self.read()
+        kept = [e for e in entries.values() if entry_tournament(e) == slug]
+        if len(kept) == len(entries):
+            return 0
+        self.clear()
+        if kept:
+            self.write_entries(kept)
+        return len(entries) - len(kept)
+
+    def clear(self) -> None:
+        if os.path.exists(self.path):
+            os.replace(self.path, f'{self.path}.bak')
+        self.entries = {}
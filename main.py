@@ -1,22 +1,181 @@
 import os
+import re
+import time
+import argparse
+import multiprocessing
 import utils
 import pyperclip
 from rich import print
 from rich.prompt import Prompt, Confirm, IntPrompt
 from prompt_toolkit import prompt
 
-from vod import VOD, ARGUMENTS_LIST as VOD_ARGS
+import startgg
+import batch
+import matching
+import search
+import probe
+import discovery
+import fingerprint
+import prefetch
+import thumbnails
+import split
+import server
+import profiling
+from journal import Journal
+from vod import ARGUMENTS_LIST as VOD_ARGS
 from startgg import Tournament, Event, Phase, Set
 
 utils.check_files()
 
-def main() -> None:
-    # Get videos from ./videos
-    vods = [VOD(f) for f in utils.filter_videos(os.listdir(utils.VIDEOS_PATH))]
-    if not vods:
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Label tournament VODs using start.gg set data')
+    parser.add_argument('--refresh', action='store_true',
+                        help='ignore cached start.gg responses and fetch everything again')
+    parser.add_argument('--include', nargs='+', default=[], metavar='ID',
+                        help='event (0) or phase (0.1) ids to download up front, other phases are loaded when needed')
+    parser.add_argument('--batch', metavar='MANIFEST',
+                        help='label videos without prompting, using a CSV or JSON manifest of filename -> set id')
+    parser.add_argument('--link', help='start.gg tournament link, used with --batch')
+    parser.add_argument('--match', action='store_true',
+                        help='suggest a set for each video from its recording time (downloads the --include phases, or every phase)')
+    parser.add_argument('--videos', action='append', metavar='FOLDER',
+                        help='folder to look for videos in, including subfolders (default: videos), can be given more than once')
+    parser.add_argument('--watch', action='store_true',
+                        help='keep watching the video folders and add new videos once they finish copying')
+    parser.add_argument('--serve', type=int, nargs='?', const=server.DEFAULT_PORT, metavar='PORT',
+                        help=f'serve the export to the userscript on localhost (default port {server.DEFAULT_PORT}) instead of copying it to the clipboard')
+    parser.add_argument('--split', action='store_true',
+                        help='offer to cut recordings longer than 90 minutes into one clip per set (needs ffmpeg)')
+    parser.add_argument('--thumbnails', action='store_true',
+                        help='make a thumbnail for each video with the player tags and characters (needs Pillow)')
+    parser.add_argument('--restart', action='store_true',
+                        help='start a new session instead of resuming the videos labelled in journal.jsonl')
+    parser.add_argument('--clock-offset', type=float, default=0, metavar='SECONDS',
+                        help='seconds to add to video file times when matching, if the capture card clock is off')
+    parser.add_argument('--profile', action='store_true',
+                        help='time API calls, set loading, tree drawing, templates and the export, and show a summary at exit')
+    parser.add_argument('--profile-output', metavar='FILE',
+                        help='also save a cProfile of the session to FILE (implies --profile), open it with python -m pstats FILE')
+    return parser.parse_args()
+
+
+def new_vods(watcher: discovery.Watcher, journal: Journal, duplicates: fingerprint.DuplicateFilter, names: dict) -> list:
+    """New videos from the watcher. names is the path of every video in the session by filename, new videos are added to it."""
+    vods = [v for v in watcher.drain() if not journal.labelled(v)]
+    unique = duplicates.filter(vods)
+    result = []
+    for vod in vods:
+        if vod not in unique:
+            print(f'[yellow]Skipping copy of an earlier video: {vod.path}')
+        elif names.setdefault(vod.filename, vod.path) != vod.path:
+            print(f'[red]Skipping {vod.path}, {names[vod.filename]} has the same filename. Rename it and run VODr again to label it')
+        else:
+            result.append(vod)
+    return result
+
+
+def split_recordings(vods: list, tournament: Tournament, index: matching.IntervalIndex, clockOffset: float) -> list:
+    """Offer to split each long recording into clips, returns the videos with the split ones replaced by their clips."""
+    result = []
+    for vod in vods:
+        if not vod.duration or vod.duration < split.SPLIT_MIN_DURATION:
+            result.append(vod)
+            continue
+
+        print()
+        print(f'{vod.filename} is {split.format_time(vod.duration)} long.')
+        cuts = split.plan(vod, index, clockOffset)
+        if cuts:
+            print(split.plan_table(vod, cuts))
+        while True:
+            answer = Prompt.ask('Split it? Enter [green]Y[/] to use these clips, [green]N[/] to keep it whole or cut points like [green]0:00-12:30, 12:45-30:00[/]',
+                                default='Y' if cuts else 'N')
+            if answer.strip().upper() in ('Y', 'N'):
+                break
+            try:
+                cuts = split.parse_cuts(answer)
+            except ValueError as err:
+                print(f'[red]Invalid cut points: {err}')
+                continue
+            split.match_cuts(vod, cuts, index, clockOffset)
+            print(split.plan_table(vod, cuts))
+
+        if answer.strip().upper() == 'N' or not cuts:
+            result.append(vod)
+            continue
+        clips = split.split(vod, cuts)
+        if len(clips) < len(cuts):
+            print(f'[yellow]{len(cuts) - len(clips)} clips of {vod.filename} could not be made')
+        result.extend(clips)
+    return result
+
+
+def main(args: argparse.Namespace) -> None:
+    startgg.responseCache.refresh = args.refresh
+
+    # Every confirmed video is journaled right away, so a crash or closing the window loses nothing
+    journal = Journal(utils.JOURNAL_PATH, utils.EXPORT_PATH)
+    if args.restart:
+        journal.clear()
+
+    # The userscript fetches each video's title and description from here, including videos labelled after it started
+    exportServer = None
+    if args.serve:
+        try:
+            exportServer = server.ExportServer(journal, args.serve)
+        except OSError as err:
+            # Usually the port is taken, by another program or a VODr that is still open
+            print(f'[yellow]Could not serve the export on port {args.serve}: {err.strerror or err}. '
+                  f'Pick another port with [bold]--serve PORT[/]. The export code will be '
+                  f'{"saved to " + utils.EXPORT_PATH if args.batch else "copied to the clipboard"} instead.')
+        else:
+            exportServer.start()
+            print(f'[green]Serving the export at {exportServer.url}')
+
+    if args.thumbnails and not thumbnails.available():
+        print('[yellow]Thumbnails need Pillow, install it with [bold]pip install Pillow[/]. Continuing without thumbnails.')
+        args.thumbnails = False
+
+    # Get videos from ./videos, or the given folders. Videos in subfolders named after a station get that station
+    roots = args.videos or [utils.VIDEOS_PATH]
+
+    if args.batch:
+        batch.main(args.batch, args.link or Prompt.ask('Enter start.gg link'), journal, args.thumbnails, roots)
+        if exportServer:
+            print(f'[green]Export served at {exportServer.url}, keep VODr open while uploading')
+            utils.leave()
+        return
+
+    vods = discovery.discover(roots)
+    if not vods and not args.watch:
         print('[red]No videos found, please place videos in /videos.')
         utils.leave()
 
+    if args.watch:
+        watcher = discovery.Watcher(roots, [v.path for v in vods])
+        watcher.start()
+    else:
+        watcher = None
+
+    # Copies of the same recording (under another name or on another drive) are only labelled once
+    duplicates = fingerprint.DuplicateFilter()
+    unique = duplicates.filter(vods)
+    if len(unique) < len(vods):
+        print(duplicates.summary_table())
+        vods = unique
+
+    # The export is keyed by filename, so two station folders can't both have an LGP-001.MP4
+    clashes = discovery.name_clashes(vods)
+    if clashes:
+        print(discovery.name_clash_table(clashes))
+        print('[red]The userscript can only tell videos apart by filename. Rename these so every video has its own filename '
+              '(for example by adding the station number) and run VODr again.')
+        utils.leave()
+    names = {v.filename: v.path for v in vods}
+
+    # Durations and damaged files, read from the container headers in parallel
+    probe.probe(vods)
+
     # Get startgg tournament
     tournament: Tournament = None
     while not tournament:
@@ -24,6 +183,9 @@ def main() -> None:
         try:
             slug = utils.parse_link(link)
             tournament = Tournament(slug)
+            if args.include:
+                phases = tournament.filter_phases(args.include)
+                tournament.load_sets(phases)
 
             while True:
                 print()
@@ -48,7 +210,6 @@ def main() -> None:
                                 else:
                                     tournament.events[int(ids[0])].phases[int(ids[1])].name = Prompt.ask(
                                         f'Enter name for phase ({tournament.events[int(ids[0])].phases[int(ids[1])].name})')
-                                tournament.build_tree()
                             except:
                                 print(
                                     f'[red]:warning: Invalid ID {".".join(ids)}')
@@ -63,13 +224,73 @@ def main() -> None:
             print(f'[red]Invalid link:[/red] {link}')
         except (utils.TournamentNotFoundError):
             print(f'[red]Tournament not found:[/red] {slug}')
+        except (utils.APIError) as err:
+            print(f'[red]Failed to get tournament data:[/red] {err}')
+
+    # Only a session for the same tournament is resumed
+    setAside = journal.set_aside(tournament.slug)
+    if setAside:
+        print(f'[yellow]Starting a new session, {setAside} videos labelled for another tournament were moved to {journal.path}.bak')
+    journal.load()
+    if journal.entries:
+        labelled = [v for v in vods if journal.labelled(v)]
+        print(f'[green]Resuming session, {len(labelled)} videos already labelled (run with --restart to start over)')
+        vods = [v for v in vods if not journal.labelled(v)]
+
+    # Suggest sets from recording times
+    if args.match:
+        phases = tournament.filter_phases(args.include) if args.include else None
+        tournament.load_sets(phases)
+        index = matching.IntervalIndex(tournament, phases)
+    else:
+        index = None
+
+    # Recordings of a whole stream are cut into one clip per set, using the set times to find the cuts
+    if args.split:
+        if split.FFMPEG:
+            splitIndex = index
+            if not splitIndex and any(v.duration and v.duration >= split.SPLIT_MIN_DURATION for v in vods):
+                tournament.load_sets()
+                splitIndex = matching.IntervalIndex(tournament)
+            vods[:] = [v for v in split_recordings(vods, tournament, splitIndex, args.clock_offset) if not journal.labelled(v)]
+        else:
+            print('[yellow]Splitting videos needs ffmpeg, install it from https://ffmpeg.org and make sure it is on your PATH.')
+
+    # Suggestions and phase downloads for the next videos happen in the background while labelling
+    prefetcher = prefetch.Prefetcher(tournament, vods, index, args.clock_offset)
+
+    setIndex = search.SetIndex(tournament)
+    setCompleter = search.SetCompleter(setIndex)
 
     # Get data for each vod
-    for vod in vods:
+    i = -1
+    while True:
+        i += 1
+        if watcher:
+            # The prefetcher shares this list, so new videos are prepared like the rest
+            vods.extend(new_vods(watcher, journal, duplicates, names))
+            if i == len(vods):
+                print()
+                print('[green]Waiting for new videos... (press Ctrl+C to finish)')
+                try:
+                    while not (new := new_vods(watcher, journal, duplicates, names)):
+                        time.sleep(discovery.POLL_INTERVAL)
+                except KeyboardInterrupt:
+                    break
+                vods.extend(new)
+        if i == len(vods):
+            break
+
+        vod = prefetcher.ready(i)
         print()
-        print(tournament.tree)
+        print(tournament.small_view())
         print()
         vod.open_video()
+        if vod.metadata and vod.metadata.truncated:
+            print('[yellow]:warning: This video looks incomplete, the recording may have been cut off')
+        if vod.suggestion:
+            print(f'Suggested set: [green]\[{vod.suggestion.id}][/] {vod.suggestion.set.roundShort} - {vod.suggestion.set} '
+                  f'({vod.suggestion.confidence:.0%} match, press Enter to use it)')
 
         skip = False
         confirmSet = False
@@ -79,8 +300,19 @@ def main() -> None:
             set: Set = None
             # Select the set
             while not set:
-                setId = Prompt.ask(
-                    'Enter [green]\[Set ID][/green] (Enter [green]V[/] to reopen video, [green]X[/] to skip video)')
+                print('Enter [green]\[Set ID][/green] or search by player, round, phase or character (Enter a [green]\[Phase ID][/] to show its sets, '
+                      '[green]T[/] to show all sets, [green]R[/] to check for updated sets, [green]V[/] to reopen video, [green]X[/] to skip video)')
+                setId = prompt('Set: ', completer=setCompleter, complete_while_typing=True,
+                               default=vod.suggestion.id if vod.suggestion else '').strip()
+
+                if not setId:
+                    continue
+
+                if setId.lower() == 't':
+                    print()
+                    print(tournament.full_view())
+                    print()
+                    continue
 
                 if setId.lower() == 'v':
                     vod.open_video()
@@ -90,10 +322,54 @@ def main() -> None:
                     skip = True
                     break
 
+                if setId.lower() == 'r':
+                    try:
+                        changed = tournament.refresh()
+                    except utils.APIError as err:
+                        print(f'[red]{err}')
+                        continue
+                    print(f'[green]Updated {len(changed)} phase{"" if len(changed) == 1 else "s"}')
+                    continue
+
+                if re.fullmatch(r'\d+\.\d+', setId):
+                    try:
+                        phase = tournament.get_phase(setId)
+                        tournament.load_sets([phase])
+                    except (ValueError, IndexError):
+                        print(f'[red]:warning: Invalid phase index: {setId}')
+                        continue
+                    except utils.APIError as err:
+                        print(f'[red]{err}')
+                        continue
+                    print()
+                    print(tournament.phase_view(phase))
+                    print()
+                    continue
+
+                if not re.fullmatch(r'[\d.]+', setId):
+                    # Players can be in any phase, so the first search downloads the phases that aren't loaded yet
+                    try:
+                        tournament.load_sets()
+                    except utils.APIError as err:
+                        print(f'[red]{err}')
+                    results = setIndex.search(setId)
+                    if results:
+                        for id, e, p, s in results:
+                            print(f'[green]\[{id}][/] {s.roundShort} - {s} [dim]({e.name} {p.name})')
+                    else:
+                        print(f'[yellow]No sets found for {setId}')
+                    unsearched = setIndex.unsearched()
+                    if unsearched:
+                        print(f'[yellow]Not searched, these phases could not be downloaded: {", ".join(unsearched)}')
+                    continue
+
                 try:
                     event, phase, set = tournament.parse_index(setId)
-                except:
+                except ValueError:
+                    # parse_index already printed that the index is invalid
                     pass
+                except utils.APIError as err:
+                    print(f'[red]{err}')
 
             if skip:
                 break
@@ -106,9 +382,13 @@ def main() -> None:
             print(f'[yellow]Skipping video: {vod.filename}')
             continue
 
+        prefetcher.follow(event, phase)
+
         # Check player order
         if not Confirm.ask('Are the players in the correct order?'):
             set.p1 = 1
+            # The set is drawn with the new player order next time the phase is shown
+            phase.version += 1
 
         # Check for missing characters and prompt to manually add them
         for player in set.players:
@@ -124,6 +404,7 @@ def main() -> None:
                         except:
                             chars = None
                     player.characters = chars
+                    phase.version += 1
 
         # Insert data into the vod and process the template with it
         vod.tournament = tournament
@@ -152,17 +433,24 @@ def main() -> None:
                 break
 
         vod.processed = True
+        journal.append(vod)
 
-    exportCode = utils.export_code(vods)
-
-    if exportCode:
-        pyperclip.copy(exportCode)
-        print('[green]:white_check_mark: Export code copied to clipboard')
+    prefetcher.shutdown()
+    if watcher:
+        watcher.stop()
 
-        with open('export.json', 'w') as f:
-            f.write(exportCode)
-            print(
-                f'[green]:white_check_mark: Export code saved to [link={os.path.abspath("export.json")}]export.json[/]')
+    if args.thumbnails:
+        labelled = [v for v in vods if v.processed]
+        thumbnails.generate(labelled)
+        journal.extend([v for v in labelled if v.thumbnail])
+    if journal.entries:
+        if exportServer:
+            print(f'[green]:white_check_mark: Export served at {exportServer.url}, keep VODr open while uploading')
+        else:
+            pyperclip.copy(journal.export_code())
+            print('[green]:white_check_mark: Export code copied to clipboard')
+        print(
+            f'[green]:white_check_mark: Export code saved to [link={os.path.abspath(utils.EXPORT_PATH)}]{utils.EXPORT_PATH}[/]')
     else:
         print('[yellow]No VODs processed, skipping export')
 
@@ -170,4 +458,9 @@ def main() -> None:
 
 
 if __name__ == "__main__":
-    main()
+    # Probing and thumbnails use worker processes, which re-run the whole program in a frozen Windows build without this
+    multiprocessing.freeze_support()
+    args = parse_args()
+    if args.profile or args.profile_output:
+        profiling.enable(args.profile_output)
+    main(args)
@@ -0,0 +1,74 @@
+# Suggest sets for VODs by matching recording times against set times
+
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass
+
+from startgg import Tournament, Event, Phase, Set
+from vod import VOD
+
+# Used for sets that have started but not been reported yet
+DEFAULT_SET_DURATION = 20 * 60
+# Suggestions below this confidence are not offered as the default
+MIN_CONFIDENCE = 0.1
+
+
+@dataclass
+class Suggestion:
+    id: str
+    event: Event
+    phase: Phase
+    set: Set
+    confidence: float
+
+
+class IntervalIndex:
+    """Set intervals sorted by start time. Overlap queries only look at sets starting within the longest set of the query."""
+
+    def __init__(self, tournament: Tournament, phases: list[Phase] = None) -> None:
+        entries = []
+        for ei, e in enumerate(tournament.events):
+            for pi, p in enumerate(e.phases):
+                if not p.loaded or (phases is not None and p not in phases):
+                    continue
+                for si, s in enumerate(p.sets):
+                    if not s.startedAt:
+                        continue
+                    end = s.completedAt or s.startedAt + DEFAULT_SET_DURATION
+                    entries.append((s.startedAt, end, f'{ei}.{pi}.{si}', e, p, s))
+
+        entries.sort(key=lambda e: e[0])
+        self.entries = entries
+        self.starts = [e[0] for e in entries]
+        self.maxDuration = max((e[1] - e[0] for e in entries), default=0)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def overlapping(self, start: float, end: float) -> list[tuple]:
+        lo = bisect_left(self.starts, start - self.maxDuration)
+        hi = bisect_right(self.starts, end)
+        return [e for e in self.entries[lo:hi] if e[1] > start]
+
+    def suggest(self, start: float, end: float, station: int = None) -> Suggestion:
+        """Return the set overlapping the recording the most, scored by intersection over union, or None."""
+        best = None
+        for setStart, setEnd, id, e, p, s in self.overlapping(start, end):
+            if station is not None and s.station is not None and s.station != station:
+                continue
+            overlap = min(end, setEnd) - max(start, setStart)
+            union = max(end, setEnd) - min(start, setStart)
+            confidence = overlap / union if union > 0 else 0
+            if not best or confidence > best.confidence:
+                best = Suggestion(id, e, p, s, confidence)
+
+        if best and best.confidence >= MIN_CONFIDENCE:
+            return best
+        return None
+
+
+def suggest(vod: VOD, index: IntervalIndex, clockOffset: float = 0) -> Suggestion:
+    """Suggest a set for a VOD. clockOffset is added to the file times to correct a capture card clock."""
+    interval = vod.recording_interval()
+    if not interval:
+        return None
+    return index.suggest(interval[0] + clockOffset, interval[1] + clockOffset, vod.station)
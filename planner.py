@@ -0,0 +1,114 @@
+# Packs phase set pages into batched GraphQL documents
+
+import re
+from dataclasses import dataclass, field
+
+# start.gg rejects queries that could return more than 1000 objects
+OBJECT_LIMIT = 1000
+# Objects wrapping each page in a batch (phase and sets)
+PAGE_OVERHEAD = 2
+# Expected length of list fields inside a set, used when estimating the size of a page
+LIST_SIZES = {'games': 5, 'selections': 2, 'slots': 2}
+
+
+@dataclass(frozen=True)
+class Page:
+    phaseId: int
+    start: int
+    perPage: int
+    # Only ask for sets updated after this timestamp, used to refresh phases that are already loaded
+    updatedAfter: int = None
+    # Sets the page actually holds when that is known, the last page of a phase is usually partial
+    sets: int = field(default=None, compare=False)
+
+    @property
+    def number(self) -> int:
+        return self.start // self.perPage + 1
+
+    @property
+    def key(self) -> dict:
+        return {'phaseId': self.phaseId, 'start': self.start, 'perPage': self.perPage, 'updatedAfter': self.updatedAfter}
+
+
+def estimate_objects(fields: str) -> int:
+    """Estimate how many objects a selection set returns, counting list fields by their expected length."""
+    tokens = re.findall(r'\w+|[{}]', re.sub(r'\(.*?\)', '', fields))
+
+    def walk(i: int) -> tuple[int, int]:
+        cost = 0
+        while i < len(tokens) and tokens[i] != '}':
+            name = tokens[i]
+            if i + 1 < len(tokens) and tokens[i + 1] == '{':
+                children, i = walk(i + 2)
+                cost += LIST_SIZES.get(name, 1) * (1 + children)
+            i += 1
+        return cost, i
+
+    return walk(0)[0]
+
+
+class QueryPlanner:
+    fields: str
+    limit: int
+    nodeCost: int
+    maxPerPage: int
+
+    def __init__(self, fields: str, limit: int = OBJECT_LIMIT) -> None:
+        self.fields = fields
+        self.limit = limit
+        self.nodeCost = 1 + estimate_objects(fields)
+        self.maxPerPage = max(1, (limit - PAGE_OVERHEAD) // self.nodeCost)
+
+    def page_cost(self, page: Page) -> int:
+        return PAGE_OVERHEAD + (page.perPage if page.sets is None else page.sets) * self.nodeCost
+
+    def pages(self, phaseId: int, numSets: int) -> list[Page]:
+        if not numSets:
+            return []
+        # Small phases ask for exactly their size so several of them fit in one request
+        perPage = min(self.maxPerPage, numSets)
+        return [Page(phaseId, start, perPage, sets=min(perPage, numSets - start)) for start in range(0, numSets, perPage)]
+
+    def batches(self, pages: list[Page]) -> list[list[Page]]:
+        """Pack pages into as few documents as possible without going over the object limit, largest first.
+        The pages come out of order, so results have to be sorted by phase and offset afterwards."""
+        batches = []
+        costs = []
+        for page in sorted(pages, key=self.page_cost, reverse=True):
+            pageCost = self.page_cost(page)
+            i = next((i for i, cost in enumerate(costs) if cost + pageCost <= self.limit), None)
+            if i is None:
+                batches.append([page])
+                costs.append(pageCost)
+            else:
+                batches[i].append(page)
+                costs[i] += pageCost
+        return batches
+
+    def split(self, batch: list[Page]) -> list[list[Page]]:
+        """Split a batch the server rejected as too complex. Single pages are split into smaller pages."""
+        if len(batch) > 1:
+            return [batch[:len(batch) // 2], batch[len(batch) // 2:]]
+
+        page = batch[0]
+        if page.perPage == 1:
+            return []
+        # The smaller page size has to divide the start and the size so the new pages cover exactly the same range
+        perPage = next(p for p in range(page.perPage // 2, 0, -1)
+                       if page.start % p == 0 and page.perPage % p == 0)
+        if page.sets is None:
+            return [[Page(page.phaseId, start, perPage, page.updatedAfter)] for start in range(page.start, page.start + page.perPage, perPage)]
+        # Smaller pages past the end of the phase would come back empty
+        end = page.start + page.sets
+        return [[Page(page.phaseId, start, perPage, page.updatedAfter, min(perPage, end - start))] for start in range(page.start, end, perPage)]
+
+    def document(self, batch: list[Page]) -> str:
+        def filters(page: Page) -> str:
+            return f', filters: {{updatedAfter: {int(page.updatedAfter)}}}' if page.updatedAfter is not None else ''
+
+        aliases = '\n'.join(f'''p{i}: phase(id: {int(page.phaseId)}) {{
+                    sets(page: {page.number}, perPage: {page.perPage}, sortType: CALL_ORDER{filters(page)}) {{
+                        nodes {{ {self.fields} }}
+                    }}
+                }}''' for i, page in enumerate(batch))
+        return f'query PhaseSets {{\n{aliases}\n}}'
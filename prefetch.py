@@ -0,0 +1,65 @@
+# Prepares upcoming VODs in the background while the current one is being labelled
+
+from concurrent.futures import ThreadPoolExecutor, Future
+
+import probe
+import matching
+from vod import VOD
+from startgg import Tournament, Event, Phase
+
+# How many VODs after the current one are prepared ahead of time
+PREFETCH_AHEAD = 3
+PREFETCH_WORKERS = 2
+
+
+class Prefetcher:
+    tournament: Tournament
+    vods: list[VOD]
+    index: matching.IntervalIndex
+    futures: dict[VOD, Future]
+
+    def __init__(self, tournament: Tournament, vods: list[VOD], index: matching.IntervalIndex = None, clockOffset: float = 0) -> None:
+        self.tournament = tournament
+        self.vods = vods
+        self.index = index
+        self.clockOffset = clockOffset
+        self.futures = {}
+        self.pool = ThreadPoolExecutor(max_workers=PREFETCH_WORKERS, thread_name_prefix='prefetch')
+
+    def prepare(self, vod: VOD) -> None:
+        # Videos are normally probed up front, this covers any added since
+        if not vod.probed:
+            probe.probe([vod], quiet=True)
+        # Clips split from a longer recording know their set already
+        if self.index and not vod.suggestion:
+            vod.suggestion = matching.suggest(vod, self.index, self.clockOffset)
+        if vod.suggestion:
+            # Warm the phase the operator will most likely pick from
+            self.tournament.load_sets([vod.suggestion.phase], quiet=True)
+
+    def submit(self, vod: VOD) -> None:
+        if vod not in self.futures:
+            self.futures[vod] = self.pool.submit(self.prepare, vod)
+
+    def ready(self, i: int) -> VOD:
+        """Wait until the i-th VOD is prepared and start preparing the ones after it."""
+        vod = self.vods[i]
+        self.submit(vod)
+        for next in self.vods[i + 1:i + 1 + PREFETCH_AHEAD]:
+            self.submit(next)
+
+        try:
+            self.futures.pop(vod).result()
+        except Exception:
+            # Anything that failed in the background is done again (and reported) when it is needed
+            pass
+        return vod
+
+    def follow(self, event: Event, phase: Phase) -> None:
+        """Load the phase after the one just picked, consecutive VODs usually move on to the next phase of the bracket."""
+        i = event.phases.index(phase)
+        if i + 1 < len(event.phases):
+            self.pool.submit(self.tournament.load_sets, [event.phases[i + 1]], True)
+
+    def shutdown(self) -> None:
+        self.pool.shutdown(wait=False, cancel_futures=True)
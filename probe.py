@@ -0,0 +1,179 @@
+# Read container metadata (duration, resolution, creation time) from video files
+
+import os
+import json
+import shutil
+import struct
+import subprocess
+from dataclasses import dataclass, asdict
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+from rich.progress import track
+
+import utils
+from cache import FileCache
+from vod import VOD
+
+PROBE_WORKERS = min(8, os.cpu_count() or 1)
+PROBE_TIMEOUT = 30
+# Containers the built in reader understands, everything else needs ffprobe
+ATOM_FORMATS = ('.mp4', '.mov', '.m4v', '.mpeg4')
+# MP4 times count seconds from 1904-01-01
+MP4_EPOCH_OFFSET = 2082844800
+
+FFPROBE = shutil.which('ffprobe')
+
+probeCache = FileCache(os.path.join(utils.FILE_CACHE_PATH, 'probe.json'))
+
+
+@dataclass
+class Metadata:
+    duration: float = None
+    width: int = None
+    height: int = None
+    created: float = None
+    # The file ends before its headers say it should, usually a recording that was cut off
+    truncated: bool = False
+    source: str = None
+
+
+def read_boxes(f, start: int, end: int):
+    """Yield (type, content start, box end) for the boxes between start and end."""
+    pos = start
+    while pos + 8 <= end:
+        f.seek(pos)
+        size, kind = struct.unpack('>I4s', f.read(8))
+        headerSize = 8
+        if size == 1:
+            size = struct.unpack('>Q', f.read(8))[0]
+            headerSize = 16
+        elif size == 0:
+            # Runs to the end of the file
+            size = end - pos
+        if size < headerSize:
+            raise ValueError(f'Invalid box size at {pos}')
+        yield kind, pos + headerSize, pos + size
+        pos += size
+
+
+def probe_atoms(path: str) -> Metadata:
+    """Read the moov header of an MP4/MOV file without ffprobe."""
+    meta = Metadata(source='atoms')
+    with open(path, 'rb') as f:
+        fileSize = os.fstat(f.fileno()).st_size
+        moov = None
+        for kind, start, end in read_boxes(f, 0, fileSize):
+            if end > fileSize:
+                meta.truncated = True
+            if kind == b'moov':
+                moov = (start, min(end, fileSize))
+        # Recorders write moov when the recording stops, a crash leaves the file without one
+        if not moov:
+            meta.truncated = True
+            return meta
+
+        for kind, start, end in read_boxes(f, *moov):
+            if kind == b'mvhd':
+                f.seek(start)
+                version = f.read(4)[0]
+                if version == 1:
+                    created, _, timescale, duration = struct.unpack('>QQIQ', f.read(28))
+                else:
+                    created, _, timescale, duration = struct.unpack('>IIII', f.read(16))
+                if timescale:
+                    meta.duration = duration / timescale
+                if created > MP4_EPOCH_OFFSET:
+                    meta.created = created - MP4_EPOCH_OFFSET
+            elif kind == b'trak' and meta.width is None:
+                for trakKind, trakStart, _ in read_boxes(f, start, end):
+                    if trakKind != b'tkhd':
+                        continue
+                    f.seek(trakStart)
+                    version = f.read(4)[0]
+                    # Width and height are 16.16 fixed point at the end of the box, audio tracks have 0
+                    f.seek(trakStart + (88 if version == 1 else 76))
+                    width, height = struct.unpack('>II', f.read(8))
+                    if width and height:
+                        meta.width, meta.height = width >> 16, height >> 16
+    return meta
+
+
+def probe_ffprobe(path: str) -> Metadata:
+    result = subprocess.run([FFPROBE, '-v', 'error', '-print_format', 'json', '-show_format', '-show_streams', path],
+                            capture_output=True, timeout=PROBE_TIMEOUT)
+    meta = Metadata(source='ffprobe')
+    if result.returncode != 0:
+        # Mostly "moov atom not found" from interrupted recordings
+        meta.truncated = True
+        return meta
+
+    data = json.loads(result.stdout)
+    format = data.get('format', {})
+    if format.get('duration'):
+        meta.duration = float(format['duration'])
+    created = format.get('tags', {}).get('creation_time')
+    if created:
+        try:
+            meta.created = datetime.fromisoformat(created).timestamp()
+        except ValueError:
+            pass
+    for stream in data.get('streams', []):
+        if stream.get('codec_type') == 'video':
+            meta.width, meta.height = stream.get('width'), stream.get('height')
+            break
+    return meta
+
+
+def probe_file(path: str) -> dict:
+    """Probe one file. Returns the metadata as a dict so it can be passed between processes and cached,
+    an empty dict if the format can't be read without ffprobe or None if probing failed."""
+    try:
+        if FFPROBE:
+            return asdict(probe_ffprobe(path))
+        if path.lower().endswith(ATOM_FORMATS):
+            return asdict(probe_atoms(path))
+        return {}
+    except (OSError, ValueError, struct.error, subprocess.SubprocessError):
+        return None
+
+
+def apply(vod: VOD, data: dict) -> None:
+    vod.probed = True
+    vod.metadata = Metadata(**data) if data else None
+    if vod.metadata and vod.metadata.duration:
+        vod.duration = vod.metadata.duration
+
+
+def probe(vods: list[VOD], quiet: bool = False) -> None:
+    """Fill in metadata for every VOD. Files that haven't changed since the last run are not opened again."""
+    missing = []
+    for vod in vods:
+        data = probeCache.get(vod.path)
+        if data is not None:
+            apply(vod, data)
+        else:
+            missing.append(vod)
+
+    if len(missing) > 1:
+        with ProcessPoolExecutor(max_workers=min(PROBE_WORKERS, len(missing))) as pool:
+            results = pool.map(probe_file, [v.path for v in missing])
+            if not quiet:
+                results = track(results, total=len(missing), description='Reading videos...', transient=True)
+            results = [*results]
+    else:
+        results = [probe_file(v.path) for v in missing]
+
+    for vod, data in zip(missing, results):
+        apply(vod, data)
+        if data is not None:
+            probeCache.set(vod.path, data)
+    probeCache.save()
+
+
+if __name__ == '__main__':
+    from rich import print
+    from discovery import discover
+    vods = discover([utils.VIDEOS_PATH])
+    probe(vods)
+    for vod in vods:
+        print(vod.filename, vod.metadata)
@@ -0,0 +1,134 @@
+# Opt-in timing of the slow parts of a session, turned on with --profile
+#
+#     with profiling.span('tree.render'):
+#         ...
+#
+# While it is off every span is the same do-nothing object, so spans can stay in hot paths
+
+import time
+import atexit
+import cProfile
+import threading
+from functools import wraps
+from rich import print
+from rich.table import Table
+
+ENABLED = False
+
+# Span name -> [calls, total seconds, longest call]
+stats: dict[str, list] = {}
+statsLock = threading.Lock()
+profiler: cProfile.Profile = None
+profilePath: str = None
+started = 0.0
+finished = False
+# Functions returning more tables to print with the summary, like the API call stats
+reports = []
+
+
+class Span:
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+
+    def __enter__(self) -> 'Span':
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        record(self.name, time.perf_counter() - self.start)
+
+
+class NullSpan:
+    __slots__ = ()
+
+    def __enter__(self) -> 'NullSpan':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        pass
+
+
+NULL_SPAN = NullSpan()
+
+
+def span(name: str):
+    return Span(name) if ENABLED else NULL_SPAN
+
+
+def timed(name: str):
+    """Decorator version of span, for functions that are timed as a whole."""
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return fn(*args, **kwargs)
+            with Span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def record(name: str, seconds: float) -> None:
+    with statsLock:
+        entry = stats.get(name)
+        if entry is None:
+            stats[name] = [1, seconds, seconds]
+        else:
+            entry[0] += 1
+            entry[1] += seconds
+            if seconds > entry[2]:
+                entry[2] = seconds
+
+
+def report(fn) -> None:
+    reports.append(fn)
+
+
+def enable(path: str = None) -> None:
+    """Start timing spans. With a path, the main thread is also profiled with cProfile and the stats saved there."""
+    global ENABLED, started, profiler, profilePath
+    ENABLED = True
+    started = time.perf_counter()
+    if path:
+        profilePath = path
+        profiler = cProfile.Profile()
+        profiler.enable()
+    atexit.register(finish)
+
+
+def summary_table():
+    elapsed = time.perf_counter() - started
+    # Spans from worker threads overlap, so their totals can add up to more than the session
+    table = Table(title=f'Profile ({elapsed:.1f}s session, worker threads counted separately)', expand=False)
+    table.add_column('Span')
+    table.add_column('Calls', justify='right')
+    table.add_column('Total', justify='right')
+    table.add_column('Mean', justify='right')
+    table.add_column('Max', justify='right')
+    table.add_column('Session', justify='right')
+
+    with statsLock:
+        rows = sorted(stats.items(), key=lambda s: s[1][1], reverse=True)
+    for name, (calls, total, longest) in rows:
+        table.add_row(name, f'{calls:,}', f'{total:.3f}s', f'{total / calls * 1000:.2f}ms',
+                      f'{longest * 1000:.1f}ms', f'{total / elapsed:.0%}' if elapsed else '')
+    return table
+
+
+def finish() -> None:
+    """Print the summary and save the cProfile stats. Only the first call does anything."""
+    global finished
+    if not ENABLED or finished:
+        return
+    finished = True
+    if profiler:
+        profiler.disable()
+        profiler.dump_stats(profilePath)
+    print()
+    print(summary_table())
+    for fn in reports:
+        print(fn())
+    if profiler:
+        print(f'[green]Profile saved to {profilePath}, open it with: python -m pstats {profilePath}')
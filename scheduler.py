@@ -0,0 +1,84 @@
+# Concurrent, rate limited fetching for the start.gg API
+
+import time
+import threading
+from typing import Callable
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from rich.progress import track
+
+# start.gg allows 80 requests per 60 seconds per token
+RATE_LIMIT_REQUESTS = 80
+RATE_LIMIT_PERIOD = 60
+RATE_LIMIT_BURST = 10
+
+MAX_WORKERS = 8
+
+
+class TokenBucket:
+    rate: float
+    capacity: float
+    tokens: float
+
+    def __init__(self, rate: float = RATE_LIMIT_REQUESTS / RATE_LIMIT_PERIOD, capacity: float = RATE_LIMIT_BURST) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.pausedUntil = 0.0
+        self.lock = threading.Lock()
+
+    def refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens +
+                          (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self) -> None:
+        """Block until a request is allowed to go out."""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                if now >= self.pausedUntil:
+                    self.refill(now)
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return
+                    wait = (1 - self.tokens) / self.rate
+                else:
+                    wait = self.pausedUntil - now
+            time.sleep(wait)
+
+    def pause(self, seconds: float) -> None:
+        """Stop handing out tokens for a while, used when the server says we are going too fast."""
+        with self.lock:
+            now = time.monotonic()
+            self.pausedUntil = max(self.pausedUntil, now + seconds)
+            self.tokens = 0
+            self.updated = max(now, self.pausedUntil)
+
+
+class FetchScheduler:
+    limiter: TokenBucket
+    workers: int
+
+    def __init__(self, limiter: TokenBucket, workers: int = MAX_WORKERS) -> None:
+        # Retries and 429 backoff are handled by the api client, which shares the same limiter
+        self.limiter = limiter
+        self.workers = workers
+
+    def run(self, jobs: list[Callable], description: str = '[white]Working...', quiet: bool = False) -> list:
+        """Run every job across the worker pool. Results are returned in the same order as the jobs.
+        Quiet runs don't draw a progress bar, for work done in the background while the user is typing."""
+        results = [None] * len(jobs)
+        if not jobs:
+            return results
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            futures = {pool.submit(job): i for i,
+                       job in enumerate(jobs)}
+            completed = as_completed(futures)
+            if not quiet:
+                completed = track(completed, total=len(jobs), description=description, transient=True)
+            for future in completed:
+                results[futures[future]] = future.result()
+
+        return results
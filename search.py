@@ -0,0 +1,110 @@
+# Search index over the loaded sets of a tournament
+
+import re
+from bisect import bisect_left
+from prompt_toolkit.completion import Completer, Completion
+
+from startgg import Tournament, Event, Phase, Set
+
+TOKEN_REGEX = re.compile(r'[^\W_]+')
+MAX_RESULTS = 20
+
+
+def tokenize(text: str) -> list[str]:
+    return TOKEN_REGEX.findall(text.casefold())
+
+
+def fuzzy_match(term: str, token: str) -> bool:
+    # Every character of the term appears in the token in order, so "yhs" matches "yhsanave" and "yhnv"
+    it = iter(token)
+    return all(c in it for c in term)
+
+
+class SetIndex:
+    tournament: Tournament
+    entries: list[tuple[str, Event, Phase, Set]]
+    postings: dict[str, set[int]]
+    tokens: list[str]
+
+    def __init__(self, tournament: Tournament) -> None:
+        self.tournament = tournament
+        self.versions = {}
+        self.entries = []
+        self.postings = {}
+        self.tokens = []
+
+    def update(self) -> None:
+        """Reindex if a phase was loaded or its sets changed since the index was built. Only runs once something is
+        searched for, indexing needs the players of every set."""
+        versions = {p: p.version for e in self.tournament.events for p in e.phases if p.loaded}
+        if versions == self.versions:
+            return
+        self.versions = versions
+
+        self.entries = []
+        self.postings = {}
+        for ei, e in enumerate(self.tournament.events):
+            for pi, p in enumerate(e.phases):
+                if not p.loaded:
+                    continue
+                phaseTokens = tokenize(f'{e.name} {p.name}')
+                for si, s in enumerate(p.sets):
+                    # Sponsor prefixes are indexed as separate words, so a tag matches with or without them
+                    text = ' '.join([s.round, s.roundShort, *(pl.name for pl in s.players),
+                                     *(c.name for pl in s.players for c in pl.characters)])
+                    entry = len(self.entries)
+                    self.entries.append((f'{ei}.{pi}.{si}', e, p, s))
+                    for token in (*phaseTokens, *tokenize(text)):
+                        self.postings.setdefault(token, set()).add(entry)
+        self.tokens = sorted(self.postings)
+
+    def unsearched(self) -> list[str]:
+        """Phases that aren't loaded, so their sets can't be found."""
+        return [f'{e.name} {p.name}' for e in self.tournament.events for p in e.phases if not p.loaded]
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def match_term(self, term: str) -> set[int]:
+        # Prefix matches come from a binary search over the sorted tokens, fuzzy matching is only the fallback
+        matches = set()
+        i = bisect_left(self.tokens, term)
+        while i < len(self.tokens) and self.tokens[i].startswith(term):
+            matches |= self.postings[self.tokens[i]]
+            i += 1
+        if not matches:
+            for token in self.tokens:
+                if fuzzy_match(term, token):
+                    matches |= self.postings[token]
+        return matches
+
+    def search(self, query: str, limit: int = MAX_RESULTS) -> list[tuple[str, Event, Phase, Set]]:
+        self.update()
+        terms = tokenize(query)
+        if not terms:
+            return []
+
+        # Match the rarest terms first so the candidate set shrinks quickly
+        results = None
+        for matches in sorted((self.match_term(t) for t in terms), key=len):
+            results = matches if results is None else results & matches
+            if not results:
+                return []
+        return [self.entries[i] for i in sorted(results)[:limit]]
+
+
+class SetCompleter(Completer):
+    index: SetIndex
+
+    def __init__(self, index: SetIndex) -> None:
+        self.index = index
+
+    def get_completions(self, document, complete_event):
+        text = document.text_before_cursor
+        # Set ids and commands are typed directly, only search words
+        if not text.strip() or re.fullmatch(r'[\d.\s]*|[a-zA-Z]', text.strip()):
+            return
+        for id, e, p, s in self.index.search(text):
+            yield Completion(id, start_position=-len(text),
+                             display=f'{id} {s.roundShort} - {s.players[s.p1]} vs {s.players[1 - s.p1]}',
+                             display_meta=f'{e.name} {p.name}')
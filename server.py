@@ -0,0 +1,115 @@
+# Serves the export to the userscript over localhost, so nothing has to be pasted
+
+import os
+import json
+import threading
+from urllib.parse import unquote
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import utils
+from journal import Journal
+
+DEFAULT_PORT = 8765
+# Only reachable from this computer
+HOST = '127.0.0.1'
+
+
+class ExportHandler(BaseHTTPRequestHandler):
+    # No CORS headers are sent, so web pages can't read the export, only the userscript through GM_xmlhttpRequest
+    server: 'ExportServer'
+
+    def send_json(self, status: int, body: str) -> None:
+        data = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.send_header('Cache-Control', 'no-store')
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self) -> None:
+        entries = self.server.entries()
+        path = self.path.split('?')[0]
+
+        if path.startswith('/export/'):
+            entry = entries.get(unquote(path[len('/export/'):]))
+            if entry:
+                self.send_json(200, json.dumps(entry['export']))
+            else:
+                self.send_json(404, json.dumps({'error': 'Not found'}))
+        elif path == '/export':
+            # Streamed entry by entry instead of building the whole document first
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Cache-Control', 'no-store')
+            self.end_headers()
+            self.wfile.write(b'{')
+            for i, (filename, entry) in enumerate(entries.items()):
+                self.wfile.write(f'{", " if i else ""}{json.dumps(filename)}: {json.dumps(entry["export"])}'.encode('utf-8'))
+            self.wfile.write(b'}')
+            self.close_connection = True
+        elif path == '/status':
+            self.send_json(200, json.dumps({'videos': len(entries)}))
+        else:
+            self.send_json(404, json.dumps({'error': 'Not found'}))
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+
+class ExportServer(ThreadingHTTPServer):
+    daemon_threads = True
+    journal: Journal
+    reload: bool
+
+    def __init__(self, journal: Journal, port: int = DEFAULT_PORT, reload: bool = False) -> None:
+        """Serve the journal's entries. With reload, the journal file is read again whenever it changes,
+        for serving a session that is running (or ran) in another process."""
+        super().__init__((HOST, port), ExportHandler)
+        self.journal = journal
+        self.reload = reload
+        self.lock = threading.Lock()
+        self.stat = None
+        self.thread = threading.Thread(target=self.serve_forever, name='export-server', daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f'http://{HOST}:{self.server_port}'
+
+    def entries(self) -> dict[str, dict]:
+        """The journal's entries by filename."""
+        if self.reload:
+            with self.lock:
+                try:
+                    stat = os.stat(self.journal.path)
+                    stat = (stat.st_size, stat.st_mtime_ns)
+                except OSError:
+                    stat = None
+                if stat != self.stat:
+                    self.stat = stat
+                    self.journal.read()
+        # Copied in one step, the session may be adding entries at the same time
+        return {e['filename']: e for e in [*self.journal.entries.values()]}
+
+    def start(self) -> None:
+        self.thread.start()
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+
+if __name__ == '__main__':
+    import sys
+    from rich import print
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_PORT
+    try:
+        server = ExportServer(Journal(utils.JOURNAL_PATH, utils.EXPORT_PATH), port, reload=True)
+    except OSError as err:
+        print(f'[red]Could not serve on port {port}: {err.strerror or err}. Pass another port as the first argument.')
+        sys.exit(1)
+    print(f'[green]Serving {utils.JOURNAL_PATH} at {server.url}, press Ctrl+C to stop')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
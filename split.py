@@ -0,0 +1,185 @@
+# Split long station recordings into one clip per set with ffmpeg stream copy (no re-encoding)
+
+import os
+import shutil
+import subprocess
+from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
+from rich.progress import track
+from rich.table import Table
+
+import utils
+import matching
+from vod import VOD
+
+# Recordings at least this long are offered for splitting
+SPLIT_MIN_DURATION = 90 * 60
+# Extra footage kept before and after each set, start.gg times are only as accurate as the TOs reporting them
+CLIP_PADDING = 30
+SPLIT_WORKERS = 4
+SPLIT_TIMEOUT = 10 * 60
+
+FFMPEG = shutil.which('ffmpeg')
+
+
+@dataclass
+class Cut:
+    start: float
+    end: float
+    suggestion: matching.Suggestion = None
+
+
+def parse_time(text: str) -> float:
+    """Seconds from "H:MM:SS", "M:SS" or plain seconds."""
+    seconds = 0
+    for part in text.strip().split(':'):
+        seconds = seconds * 60 + float(part)
+    return seconds
+
+
+def format_time(seconds: float) -> str:
+    seconds = int(seconds)
+    return f'{seconds // 3600}:{seconds // 60 % 60:02d}:{seconds % 60:02d}'
+
+
+def parse_cuts(text: str) -> list[Cut]:
+    """Cut points like "0:00-12:30, 12:45-30:00". Raises ValueError if they can't be read."""
+    cuts = []
+    for part in text.split(','):
+        if not part.strip():
+            continue
+        start, end = part.split('-')
+        cut = Cut(parse_time(start), parse_time(end))
+        if cut.end <= cut.start:
+            raise ValueError(f'Cut ends before it starts: {part.strip()}')
+        cuts.append(cut)
+    return cuts
+
+
+def recording_start(vod: VOD, clockOffset: float = 0) -> float:
+    interval = vod.recording_interval()
+    return interval[0] + clockOffset if interval else None
+
+
+def plan(vod: VOD, index: matching.IntervalIndex, clockOffset: float = 0) -> list[Cut]:
+    """A cut for each set played during the recording, from the set start and end times."""
+    start = recording_start(vod, clockOffset)
+    if start is None or not vod.duration:
+        return []
+
+    cuts = []
+    for setStart, setEnd, id, e, p, s in index.overlapping(start, start + vod.duration):
+        if vod.station is not None and s.station is not None and s.station != vod.station:
+            continue
+        cuts.append(Cut(max(0, setStart - start - CLIP_PADDING),
+                        min(vod.duration, setEnd - start + CLIP_PADDING),
+                        matching.Suggestion(id, e, p, s, 1)))
+    return cuts
+
+
+def match_cuts(vod: VOD, cuts: list[Cut], index: matching.IntervalIndex, clockOffset: float = 0) -> None:
+    """Find the set for cut points entered by hand."""
+    start = recording_start(vod, clockOffset)
+    if start is None or not index:
+        return
+    for cut in cuts:
+        cut.suggestion = index.suggest(start + cut.start, start + cut.end, vod.station)
+
+
+def clip_vod(vod: VOD, cut: Cut, i: int) -> VOD:
+    stem, ext = os.path.splitext(vod.filename)
+    name = f'{stem} {i + 1:02d}'
+    if cut.suggestion:
+        s = cut.suggestion.set
+        name += f' {s.roundShort} {s.players[s.p1].name} vs {s.players[1 - s.p1].name}'
+    filename = utils.file_name_safe(name).replace('%2F', '-') + ext
+
+    clip = VOD(filename, os.path.join(utils.CLIPS_PATH, filename), vod.station)
+    clip.duration = cut.end - cut.start
+    clip.probed = True
+    # Linked to its set already, picking it at the set prompt is one key press
+    clip.suggestion = cut.suggestion
+    if cut.suggestion:
+        clip.event, clip.phase, clip.set = cut.suggestion.event, cut.suggestion.phase, cut.suggestion.set
+    return clip
+
+
+def split_file(source: str, start: float, end: float, output: str) -> bool:
+    # Clips from an earlier run are reused
+    if os.path.exists(output) and os.path.getsize(output):
+        return True
+
+    # Write under a temporary name so an interrupted split isn't mistaken for a finished clip
+    base, ext = os.path.splitext(output)
+    tmp = f'{base}.part{ext}'
+    try:
+        result = subprocess.run([FFMPEG, '-v', 'error', '-y', '-ss', f'{start:.3f}', '-i', source, '-t', f'{end - start:.3f}',
+                                 '-map', '0', '-c', 'copy', '-avoid_negative_ts', 'make_zero', tmp],
+                                capture_output=True, timeout=SPLIT_TIMEOUT)
+    except (OSError, subprocess.SubprocessError):
+        return False
+    if result.returncode != 0:
+        return False
+    os.replace(tmp, output)
+    return True
+
+
+def split(vod: VOD, cuts: list[Cut], quiet: bool = False) -> list[VOD]:
+    """Cut the video into clips, several at a time. Returns a VOD for each clip that was made."""
+    clips = [clip_vod(vod, c, i) for i, c in enumerate(cuts)]
+    os.makedirs(utils.CLIPS_PATH, exist_ok=True)
+    with ThreadPoolExecutor(max_workers=SPLIT_WORKERS) as pool:
+        results = pool.map(lambda c: split_file(vod.path, c[0].start, c[0].end, c[1].path), zip(cuts, clips))
+        if not quiet:
+            results = track(results, total=len(clips), description=f'Splitting {vod.filename}...', transient=True)
+        return [clip for clip, ok in zip(clips, results) if ok]
+
+
+def plan_table(vod: VOD, cuts: list[Cut]):
+    table = Table(title=f'Clips from {vod.filename}', expand=False)
+    table.add_column('#', justify='right')
+    table.add_column('Start')
+    table.add_column('End')
+    table.add_column('Set')
+    for i, cut in enumerate(cuts, 1):
+        table.add_row(str(i), format_time(cut.start), format_time(cut.end),
+                      f'[green]\[{cut.suggestion.id}][/] {cut.suggestion.set.roundShort} - {cut.suggestion.set}'
+                      if cut.suggestion else '[yellow]Unknown')
+    return table
+
+
+def make_sample(path: str, duration: float = 10 * 60) -> None:
+    """Generate a small test recording (colour bars with a timer and a tone) for trying out splitting."""
+    subprocess.run([FFMPEG, '-v', 'error', '-y',
+                    '-f', 'lavfi', '-i', f'testsrc=duration={duration}:size=320x180:rate=30',
+                    '-f', 'lavfi', '-i', f'sine=frequency=440:duration={duration}',
+                    '-c:v', 'libx264', '-preset', 'ultrafast', '-g', '30', '-c:a', 'aac', '-shortest', path],
+                   check=True)
+
+
+if __name__ == '__main__':
+    import sys
+    import time
+    from rich import print
+    import probe
+
+    if not FFMPEG:
+        print('[red]ffmpeg not found')
+        sys.exit(1)
+
+    # python split.py [sample.mp4] ["0:00-2:00, 2:30-5:00"]
+    path = sys.argv[1] if len(sys.argv) > 1 else os.path.join(utils.VIDEOS_PATH, 'sample.mp4')
+    if not os.path.exists(path):
+        print(f'Generating {path}')
+        make_sample(path)
+    vod = VOD(os.path.basename(path), path)
+    probe.probe([vod])
+    cuts = parse_cuts(sys.argv[2] if len(sys.argv) > 2 else '0:00-2:00, 2:30-5:00, 5:00-10:00')
+    print(plan_table(vod, cuts))
+
+    start = time.perf_counter()
+    clips = split(vod, cuts)
+    print(f'Made {len(clips)} clips in {time.perf_counter() - start:.2f}s')
+    probe.probe(clips)
+    for clip in clips:
+        print(clip.path, f'{clip.duration:.2f}s')
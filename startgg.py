@@ -1,25 +1,42 @@
 # Start.gg API Wrapper
 
-import requests
-from math import ceil
-from functools import cache
+import sys
+import time
+import threading
+from functools import cache, partial
 from rich import print
 from rich.tree import Tree
 from rich.table import Table
-from rich.progress import track
 from rich.panel import Panel
+from rich.segment import Segments
+from rich import get_console
 from prompt_toolkit.completion import FuzzyWordCompleter
 
 import utils
+import profiling
+from cache import ResponseCache, IN_PROGRESS_TTL, CHARACTER_TTL
+from scheduler import TokenBucket, FetchScheduler
+from api import Client
+from planner import QueryPlanner, Page
 
 utils.check_files()
 
 API_URL = r'https://api.start.gg/gql/alpha'
 CHARACTER_API_URL = r'https://api.smash.gg/characters?videogameId='
 
+# start.gg reports tournament state as an int and phase state as an ActivityState enum
+TOURNAMENT_COMPLETED = 3
+PHASE_COMPLETED = 'COMPLETED'
+
+responseCache = ResponseCache(utils.CACHE_PATH)
+limiter = TokenBucket()
+scheduler = FetchScheduler(limiter)
+# Phases can be loaded from the prefetch thread too, only one load runs at a time so a phase is never downloaded twice
+loadLock = threading.RLock()
+
 try:
     with open(utils.API_TOKEN_PATH, 'r') as f:
-        apiToken = f.read()
+        apiToken = f.read().strip()
     if not apiToken:
         raise
 except:
@@ -27,7 +44,15 @@ except:
     print('[red]No start.gg api key found. Paste your api key into token.txt')
     utils.leave()
 
+client = Client(apiToken, limiter)
+# Shown at exit with --profile
+profiling.report(client.summary_table)
+
+# The domain classes below use __slots__, a big bracket has tens of thousands of sets and players
+
+
 class CharImage:
+    __slots__ = ('id', 'width', 'height', 'type', 'url')
     id: int
     width: int
     height: int
@@ -43,50 +68,84 @@ class CharImage:
 
 
 class Character:
+    __slots__ = ('id', 'name', 'slug', 'images')
     id: int
     name: str
-    images: list[CharImage]
+    slug: str
+    images: tuple[CharImage]
 
     def __init__(self, char) -> None:
         self.id = char['id']
         self.name = char['name']
-        self.images = [CharImage(i) for i in char['images']]
+        self.slug = char.get('slug', '')
+        self.images = tuple(CharImage(i) for i in char['images'])
 
     def __repr__(self) -> str:
         return self.name
 
 
+def character_key(name: str) -> str:
+    # Ignore case, spacing and punctuation so "pacman" finds "Pac-Man" and "mr game and watch" finds "Mr. Game & Watch"
+    return ''.join(c for c in name.casefold().replace('&', 'and') if c.isalnum())
+
+
 class VideoGame:
     id: int
     name: str
     characters: list[Character]
+    charactersById: dict[int, Character]
+    charactersByName: dict[str, Character]
     characterCompleter: FuzzyWordCompleter
 
+    # Process-wide catalog so every event of the same game shares one roster and completer
+    catalog: dict[int, 'VideoGame'] = {}
+    catalogLock = threading.Lock()
+
     def __init__(self, id, name) -> None:
         self.id = id
         self.name = name
         self.characters = self.get_game_characters()
+        self.charactersById = {c.id: c for c in self.characters}
+        self.charactersByName = {}
+        for c in self.characters:
+            for alias in (c.name, c.slug):
+                if alias:
+                    self.charactersByName.setdefault(alias.casefold(), c)
+                    self.charactersByName.setdefault(character_key(alias), c)
         self.characterCompleter = FuzzyWordCompleter(
             words=[c.name for c in self.characters])
 
     def __repr__(self) -> str:
         return self.name
 
-    @cache
+    @classmethod
+    def get(cls, id: int, name: str) -> 'VideoGame':
+        with cls.catalogLock:
+            if id not in cls.catalog:
+                cls.catalog[id] = VideoGame(id, name)
+            return cls.catalog[id]
+
     def get_game_characters(self) -> list[Character]:
+        # The roster is kept in the response cache, so it is only downloaded once a week
         url = f'{CHARACTER_API_URL}{self.id}'
         try:
-            res = requests.get(url).json()['entities']['character']
-        except:
+            res = responseCache.get(url)
+            if res is None:
+                res = client.get(url, name='characters')['entities']['character']
+                responseCache.set(url, None, res, CHARACTER_TTL)
+        except (KeyError, TypeError):
             print(f'[yellow]No characters found for {self.name}')
             res = []
+        except utils.APIError as err:
+            print(f'[red]Failed to get characters for {self.name}: {err}')
+            res = []
         characters = [Character(c) for c in res]
         return characters
 
-    @cache
     def get_character(self, id: int = None, name: str = '') -> Character:
-        char = next((c for c in self.characters if c.id ==
-                    id or c.name.lower() == name.lower()), None)
+        char = self.charactersById.get(id) if id is not None else None
+        if not char and name:
+            char = self.charactersByName.get(name.casefold()) or self.charactersByName.get(character_key(name))
         if not char:
             raise utils.CharacterNotFoundError(
                 f'Character not found: {id or ""}{name or ""}')
@@ -94,36 +153,33 @@ class VideoGame:
 
 
 class Player:
+    __slots__ = ('id', 'name', 'characterIds', 'videoGame')
     id: int
     name: str
-    characters: list[Character]
+    # Characters are stored as ids and looked up in the game's shared roster when needed
+    characterIds: tuple[int]
     videoGame: VideoGame
 
-    def __init__(self, slots, games, videoGame: VideoGame) -> None:
-        self.id = slots['entrant']['id']
-        self.name = slots['entrant']['name']
+    def __init__(self, id: int, name: str, characterIds: tuple[int], videoGame: VideoGame) -> None:
+        self.id = id
+        # The same entrants play many sets, interning keeps one copy of each tag
+        self.name = sys.intern(name)
+        self.characterIds = characterIds
         self.videoGame = videoGame
 
-        if games:
-            selections = []
-            for game in games:
-                if game['selections']:
-                    for selection in game['selections']:
-                        char = {'id': selection['entrant']['id'],
-                                'value': selection['selectionValue']}
-                        if char not in selections:
-                            selections.append(char)
-
-            self.characters = [videoGame.get_character(
-                id=s['value']) for s in selections if s['id'] == self.id]
-        else:
-            self.characters = []
+    @property
+    def characters(self) -> list[Character]:
+        return [self.videoGame.charactersById[id] for id in self.characterIds]
+
+    @characters.setter
+    def characters(self, characters: list[Character]) -> None:
+        self.characterIds = tuple(c.id for c in characters)
 
     def __repr__(self) -> str:
-        return f'{self.name}{f" {self.print_chars()}" if self.characters else ""}'
+        return f'{self.name}{f" {self.print_chars()}" if self.characterIds else ""}'
 
     def print_chars(self) -> str:
-        return f'({", ".join([c.name for c in self.characters])})' if self.characters else ''
+        return f'({", ".join([c.name for c in self.characters])})' if self.characterIds else ''
 
     def try_set_chars(self, chars: str) -> None:
         try:
@@ -133,24 +189,77 @@ class Player:
             print(err)
 
 
+@cache
+def shorten_round(round: str) -> str:
+    # Cached, so every set of a round shares the one short name
+    return sys.intern(round.replace(' ', '').replace('-', '').replace('Winners', 'W').replace('Losers', 'L').replace('Quarter', 'Q').replace('Semi', 'S').replace('Grand', 'G').replace('Final', 'F').replace('Round', 'R').replace('Reset', ' Reset'))
+
+
 class Set:
+    __slots__ = ('id', 'round', 'startedAt', 'completedAt', 'station', 'videoGame', 'p1', 'entrants', '_players')
+    id: int
     round: str
-    roundShort: str
+    startedAt: int
+    completedAt: int
+    station: int
     videoGame: VideoGame
-    players: list[Player]
-
-    p1: int = 0
+    # Index of the player shown first, swapped when the players are in the wrong order
+    p1: int
+    # (id, name, character ids) of each entrant, players are only built from them when the set is first shown or picked.
+    # Empty for sets that are missing entrants, None once the players are built
+    entrants: tuple[tuple[int, str, tuple[int]]]
 
     def __init__(self, data, game: VideoGame) -> None:
+        self.id = data['id']
         self.videoGame = game
-        self.round = data['fullRoundText']
-        self.roundShort = self.shorten_round(self.round)
+        self.p1 = 0
+        self.round = sys.intern(data['fullRoundText'])
+        self.startedAt = data.get('startedAt')
+        self.completedAt = data.get('completedAt')
+        self.station = (data.get('station') or {}).get('number')
+        # Only what the players need is kept, not the whole decoded node
+        self.entrants = self.pack_entrants(data)
+        self._players = None
+
+    @staticmethod
+    def pack_entrants(data: dict) -> tuple:
         try:
-            self.players = [Player(s, data['games'], self.videoGame)
-                        for s in data['slots']]
-        except TypeError: 
+            entrants = [s['entrant'] for s in data['slots']]
+            # Characters each entrant picked in the order they were first played, in one pass over the games
+            picks = {e['id']: {} for e in entrants}
+            for game in data.get('games') or ():
+                for selection in game.get('selections') or ():
+                    entrantPicks = picks.get(selection['entrant']['id'])
+                    if entrantPicks is not None:
+                        entrantPicks[selection['selectionValue']] = None
+            return tuple((e['id'], sys.intern(e['name']), tuple(picks[e['id']])) for e in entrants)
+        except TypeError:
+            # Sets of a tournament that isn't complete can be missing entrants
+            return ()
+
+    @property
+    def roundShort(self) -> str:
+        return shorten_round(self.round)
+
+    @property
+    def players(self) -> tuple[Player]:
+        if self._players is None:
+            entrants = self.entrants
+            # Another thread built them first
+            if entrants is None:
+                return self._players
+            self._players = self.build_players(entrants)
+            self.entrants = None
+        return self._players
+
+    @profiling.timed('model.players')
+    def build_players(self, entrants: tuple) -> tuple[Player]:
+        if not entrants:
             # If tournament isn't complete, fill empty sets with a default value instead of crashing
-            self.players = [Player({'entrant': {'id': 'None', 'name': 'None'}}, None, self.videoGame) for _ in range(2)]
+            return tuple(Player('None', 'None', (), self.videoGame) for _ in range(2))
+        roster = self.videoGame.charactersById
+        return tuple(Player(id, name, tuple(c for c in characterIds if c in roster), self.videoGame)
+                     for id, name, characterIds in entrants)
 
     def __repr__(self) -> str:
         return f'[red]{self.players[self.p1]}[/red] vs [blue]{self.players[1 - self.p1]}[/blue]'
@@ -162,76 +271,190 @@ class Set:
         yield f'[red]{self.players[self.p1]}[/red] vs [blue]{self.players[1 - self.p1]}[/blue]'
 
     def shorten_round(self, round: str) -> str:
-        return round.replace(' ', '').replace('-', '').replace('Winners', 'W').replace('Losers', 'L').replace('Quarter', 'Q').replace('Semi', 'S').replace('Grand', 'G').replace('Final', 'F').replace('Round', 'R').replace('Reset', ' Reset')
+        return shorten_round(round)
 
 
 class Phase:
     name: str
+    state: str
     numSeeds: int
     numSets: int
     game: VideoGame
     sets: list[Set]
+    lastSync: int = None
+    # Bumped whenever the sets change so indexes and trees built from them know to rebuild
+    version: int = 0
 
     setName: str = ''
 
-    QUERY = '''query PhaseSets($id: ID!, $page: Int!) {
-                phase(id: $id) {
-                    sets(page: $page, perPage: 30, sortType: CALL_ORDER) {
-                        nodes {
-                            event {
-                                videogame {
-                                    id
-                                    name
-                                }
-                            }
-                            fullRoundText
-                            games {
-                                selections {
-                                    entrant {
-                                        id
-                                    }
-                                    selectionValue
-                                }
-                            }
-                            slots {
-                                entrant {
-                                    id
-                                    name
-                                }
-                            }
+    # Fields requested for every set, phases are fetched in batches by the query planner
+    FIELDS = '''id
+                fullRoundText
+                startedAt
+                completedAt
+                station {
+                    number
+                }
+                games {
+                    selections {
+                        entrant {
+                            id
                         }
+                        selectionValue
                     }
                 }
-            }'''
+                slots {
+                    entrant {
+                        id
+                        name
+                    }
+                }'''
 
     def __init__(self, data, game: VideoGame) -> None:
         self.id = data['id']
         self.name = data['name']
+        self.state = data['state']
         self.numSeeds = data['numSeeds']
         self.numSets = data['sets']['pageInfo']['total']
         self.game = game
-        self.sets = self.get_sets()
+        self._sets = None
 
     def __repr__(self) -> str:
         return f'{self.name} ({self.numSeeds} entrants) ({self.numSets} sets)'
 
+    @property
+    def sets(self) -> list[Set]:
+        # Sets are only downloaded the first time a phase is actually needed
+        if self._sets is None:
+            with loadLock:
+                if self._sets is None:
+                    self.get_sets()
+        return self._sets
+
+    @property
+    def loaded(self) -> bool:
+        return self._sets is not None
+
     def __rich_console__(self, console, options):
         yield f'{self.name} ({self.numSeeds} entrants) ({self.numSets} sets)'
 
-    @cache
+    def tree_key(self) -> tuple:
+        return (self.name, self.numSets, self.loaded, self.version)
+
+    @profiling.timed('model.sets')
+    def load_sets(self, nodes: list[dict], synced: int) -> None:
+        self._sets = [*reversed([Set(n, self.game) for n in nodes])]
+        self.lastSync = synced
+        self.version += 1
+
+    @profiling.timed('model.sets')
+    def merge_sets(self, nodes: list[dict], synced: int) -> bool:
+        """Merge updated set nodes into the loaded sets. Existing sets keep their index and new sets are added at the end."""
+        index = {s.id: i for i, s in enumerate(self._sets)}
+        for n in reversed(nodes):
+            if n['id'] in index:
+                self._sets[index[n['id']]] = Set(n, self.game)
+            else:
+                index[n['id']] = len(self._sets)
+                self._sets.append(Set(n, self.game))
+        self.numSets = max(self.numSets, len(self._sets))
+        self.lastSync = synced
+        if nodes:
+            self.version += 1
+        return bool(nodes)
+
     def get_sets(self) -> list[Set]:
-        sets = []
+        synced = sync_time()
+        self.load_sets(fetch_sets([self])[self], synced)
+        return self._sets
+
+
+planner = QueryPlanner(Phase.FIELDS)
+
+
+@profiling.timed('fetch.pages')
+def fetch_batch(batch: list[Page], phases: dict[int, Phase]) -> dict[Page, list[dict]]:
+    try:
+        data = client.query(API_URL, planner.document(batch), {}, name='phase')
+    except utils.QueryComplexityError:
+        # Our estimate was too optimistic, split the batch and try the halves
+        batches = planner.split(batch)
+        if not batches:
+            raise
+        results = {}
+        for b in batches:
+            results.update(fetch_batch(b, phases))
+        return results
+
+    results = {}
+    for i, page in enumerate(batch):
+        phase = phases[page.phaseId]
+        try:
+            nodes = data[f'p{i}']['sets']['nodes']
+        except (KeyError, TypeError):
+            raise utils.APIError(f'No set data returned for phase {phase.name} page {page.number}')
+        # Sets in a completed phase can't change anymore, so those pages never expire
+        if page.updatedAfter is None:
+            responseCache.set(planner.fields, page.key, nodes,
+                              None if phase.state == PHASE_COMPLETED else IN_PROGRESS_TTL)
+        results[page] = nodes
+    return results
+
+
+@profiling.timed('fetch.sets')
+def fetch_sets(phases: list[Phase], quiet: bool = False) -> dict[Phase, list[dict]]:
+    """Get the set nodes of every phase, batching all pages that aren't cached into as few requests as possible."""
+    pages = {p: planner.pages(p.id, p.numSets) for p in phases}
+
+    results = {}
+    missing = []
+    for page in (page for p in phases for page in pages[p]):
+        nodes = responseCache.get(planner.fields, page.key)
+        if nodes is None:
+            missing.append(page)
+        else:
+            results[page] = nodes
 
-        for page in track(range(ceil(self.numSets / 30)), description='[white]Getting sets...', transient=True):
-            try:
-                data = requests.post(API_URL, headers={'Authorization': f'Bearer {apiToken}'}, json={
-                    'query': Phase.QUERY, 'variables': {'id': self.id, 'page': page+1}}).json()['data']['phase']['sets']
-            except:
-                print(f'[yellow]No sets found for phase {self.name}')
-                data = {'nodes': []}
-            sets.extend([Set(s, self.game) for s in data['nodes']])
+    byId = {p.id: p for p in phases}
+    batches = planner.batches(missing)
+    for batch in scheduler.run([partial(fetch_batch, b, byId) for b in batches],
+                               description='[white]Getting sets...', quiet=quiet):
+        results.update(batch)
+
+    # Split pages come back under their own keys, so collect nodes by offset rather than by the planned pages
+    nodes = {}
+    for page, pageNodes in sorted(results.items(), key=lambda r: (r[0].phaseId, r[0].start)):
+        nodes.setdefault(page.phaseId, []).extend(pageNodes)
+    return {p: nodes.get(p.id, []) for p in phases}
 
-        return [*reversed(sets)]
+
+def sync_time() -> int:
+    # Cached pages of an in progress phase can be up to IN_PROGRESS_TTL old, so only trust them from then on
+    return int(time.time() - IN_PROGRESS_TTL)
+
+
+@profiling.timed('fetch.updates')
+def fetch_updates(phases: list[Phase]) -> dict[Phase, list[dict]]:
+    """Get the set nodes that changed in each phase since it was last synced."""
+    byId = {p.id: p for p in phases}
+    results = {p: [] for p in phases}
+    pages = [Page(p.id, 0, planner.maxPerPage, p.lastSync) for p in phases]
+
+    while pages:
+        fetched = {}
+        for batch in scheduler.run([partial(fetch_batch, b, byId) for b in planner.batches(pages)],
+                                   description='[white]Checking for updated sets...'):
+            fetched.update(batch)
+
+        # The number of updated sets isn't known up front, keep paging through phases whose last page was full
+        last = {}
+        for page, nodes in sorted(fetched.items(), key=lambda r: (r[0].phaseId, r[0].start)):
+            results[byId[page.phaseId]].extend(nodes)
+            last[page.phaseId] = (page, nodes)
+        pages = [Page(page.phaseId, page.start + page.perPage, page.perPage, page.updatedAfter)
+                 for page, nodes in last.values() if len(nodes) == page.perPage]
+
+    return results
 
 
 class Event:
@@ -243,8 +466,8 @@ class Event:
 
     def __init__(self, data) -> None:
         self.name = data['name']
-        self.game = VideoGame(data['videogame']['id'],
-                              data['videogame']['name'])
+        self.game = VideoGame.get(data['videogame']['id'],
+                                  data['videogame']['name'])
         self.phases = [Phase(p, self.game) for p in data['phases']]
 
     def __repr__(self) -> str:
@@ -259,9 +482,15 @@ class Tournament:
     slug: str
     shortSlug: str
     url: str
+    state: int
     events: list[Event]
 
     tree: Tree
+    treeSmall: Tree
+    treeKey: tuple
+    phaseTrees: dict[Phase, Tree]
+    phaseTreeKeys: dict[Phase, tuple]
+    renders: dict[tuple, Segments]
     shortName: str
 
     QUERY = '''query Tournament($slug: String!) {
@@ -270,6 +499,7 @@ class Tournament:
                         slug
                         shortSlug
                         url
+                        state
                         events {
                             name
                             videogame {
@@ -279,6 +509,7 @@ class Tournament:
                             phases {
                               id
                               name
+                              state
                               numSeeds
                               sets {
                                 pageInfo {
@@ -296,8 +527,13 @@ class Tournament:
         self.slug = data['slug']
         self.shortSlug = data['shortSlug']
         self.url = data["url"]
-        self.events = [Event(e) for e in data['events']]
+        self.state = data['state']
+        with profiling.span('model.tournament'):
+            self.events = [Event(e) for e in data['events']]
         self.shortName = self.shortSlug or None
+        self.phaseTrees = {}
+        self.phaseTreeKeys = {}
+        self.renders = {}
         self.build_tree()
 
     def __repr__(self) -> str:
@@ -309,37 +545,131 @@ class Tournament:
     @cache
     def query(self, slug: str) -> dict:
         print('[white]Getting tournament data... ', end='')
-        data = requests.post(API_URL, headers={'Authorization': f'Bearer {apiToken}'}, json={
-                             'query': Tournament.QUERY, 'variables': {'slug': slug}}).json()['data']['tournament']
-        if not data:
-            raise utils.TournamentNotFoundError('Tournament not found')
+        variables = {'slug': slug}
+        data = responseCache.get(Tournament.QUERY, variables)
+        if data is None:
+            data = client.query(API_URL, Tournament.QUERY, variables, name='tournament')['tournament']
+            if not data:
+                raise utils.TournamentNotFoundError('Tournament not found')
+            responseCache.set(Tournament.QUERY, variables, data,
+                              None if data['state'] == TOURNAMENT_COMPLETED else IN_PROGRESS_TTL)
         print('[green]Done!')
         return data
 
+    def load_sets(self, phases: list[Phase] = None, quiet: bool = False) -> None:
+        """Download the sets of the given phases, or of every phase when phases is None (an empty list loads nothing)."""
+        # Fetch the pages of every phase together so the pool and progress bar cover all of them
+        if phases is None:
+            phases = [p for e in self.events for p in e.phases]
+        with loadLock:
+            phases = [p for p in phases if not p.loaded]
+            synced = sync_time()
+            for p, nodes in fetch_sets(phases, quiet).items():
+                p.load_sets(nodes, synced)
+
+    def refresh(self) -> list[Phase]:
+        """Merge sets updated since the last sync into every loaded phase. Returns the phases that changed."""
+        with loadLock:
+            phases = [p for e in self.events for p in e.phases if p.loaded]
+            synced = sync_time()
+            changed = [p for p, nodes in fetch_updates(phases).items()
+                       if p.merge_sets(nodes, synced)]
+        self.build_tree()
+        return changed
+
+    def get_phase(self, id: str) -> Phase:
+        i = [i for i in map(int, id.split('.'))]
+        return self.events[i[0]].phases[i[1]]
+
+    def filter_phases(self, include: list[str]) -> list[Phase]:
+        """Resolve an include filter of event ids (0) and phase ids (0.1) into phases."""
+        phases = []
+        for id in include:
+            try:
+                ids = id.split('.')
+                if len(ids) == 1 or ids[1].strip().lower() == 'x':
+                    phases.extend(self.events[int(ids[0])].phases)
+                else:
+                    phases.append(self.get_phase(id))
+            except (ValueError, IndexError):
+                print(f'[red]:warning: Invalid phase index: {id}')
+        return phases
+
+    def build_phase_tree(self, ei: int, pi: int, p: Phase) -> Tree:
+        if not p.loaded:
+            # Don't download a phase just to draw it, it is expanded by entering its id
+            return Tree(f'[green]\[{ei}.{pi}][/green] {p} [dim](enter {ei}.{pi} to expand)')
+        phaseTree = Tree(f'[green]\[{ei}.{pi}.x][/green] {p}')
+
+        rounds = {}
+        for si, s in enumerate(p.sets):
+            if s.round not in rounds:
+                rounds[s.round] = []
+
+            rounds[s.round].append((si, s))
+
+        for r in rounds.keys():
+            roundTree = phaseTree.add(r)
+            for si, s in rounds[r]:
+                roundTree.add(f'[green]\[{ei}.{pi}.{si}][/green] {s}')
+
+        return phaseTree
+
+    def tree_key(self) -> tuple:
+        # Everything the tree labels depend on that can change after the tournament is created
+        return (self.name, *((e.name, *(p.tree_key() for p in e.phases)) for e in self.events))
+
+    @profiling.timed('tree.build')
     def build_tree(self):
+        """Rebuild the tournament trees, reusing the subtree of every phase whose name and sets haven't changed."""
         tournamentTreeFull = Tree(self.name)
         tournamentTreeSmall = Tree(self.name, hide_root=True)
         for ei, e in enumerate(self.events):
             eventTreeFull = tournamentTreeFull.add(f'[green]\[{ei}.x.x][/green] {e}')
             eventTreeSmall = tournamentTreeSmall.add(f'[green]\[{ei}.x][/green] {e}')
             for pi, p in enumerate(e.phases):
-                phaseTreeFull = eventTreeFull.add(f'[green]\[{ei}.{pi}.x][/green] {p}')
                 eventTreeSmall.add(f'[green]\[{ei}.{pi}][/green] {p}')
-
-                rounds = {}
-                for si, s in enumerate(p.sets):
-                    if s.round not in rounds:
-                        rounds[s.round] = []
-
-                    rounds[s.round].append((si, s))
-
-                for r in rounds.keys():
-                    roundTree = phaseTreeFull.add(r)
-                    for si, s in rounds[r]:
-                        roundTree.add(f'[green]\[{ei}.{pi}.{si}][/green] {s}')
+                key = p.tree_key()
+                if self.phaseTreeKeys.get(p) != key:
+                    self.phaseTrees[p] = self.build_phase_tree(ei, pi, p)
+                    self.phaseTreeKeys[p] = key
+                eventTreeFull.children.append(self.phaseTrees[p])
 
         self.tree = tournamentTreeFull
         self.treeSmall = tournamentTreeSmall
+        self.treeKey = self.tree_key()
+        self.renders = {}
+
+    def update_tree(self) -> None:
+        if self.tree_key() != self.treeKey:
+            self.build_tree()
+
+    def render(self, tree) -> Segments:
+        """Render one of the trees for the current terminal width. Renders are reused until the tree or the width changes."""
+        self.update_tree()
+        if tree is None:
+            tree = self.tree
+        elif isinstance(tree, Phase):
+            tree = self.phaseTrees[tree]
+
+        console = get_console()
+        key = (id(tree), console.width)
+        if key not in self.renders:
+            with profiling.span('tree.render'):
+                lines = console.render_lines(tree, pad=False, new_lines=True)
+            self.renders[key] = Segments([segment for line in lines for segment in line])
+        return self.renders[key]
+
+    def full_view(self) -> Segments:
+        return self.render(None)
+
+    def small_view(self) -> Segments:
+        self.update_tree()
+        return self.render(self.treeSmall)
+
+    def phase_view(self, phase: Phase) -> Segments:
+        # One phase at a time, so showing it costs the same however big the tournament is
+        return self.render(phase)
 
     def parse_index(self, id: str):
         try:
@@ -347,7 +677,7 @@ class Tournament:
             yield self.events[i[0]]
             yield self.events[i[0]].phases[i[1]]
             yield self.events[i[0]].phases[i[1]].sets[i[2]]
-        except:
+        except (ValueError, IndexError):
             print(f'[red]:warning: Invalid set index: {id}')
             return None
 
@@ -359,6 +689,7 @@ class Tournament:
         grid.add_row('[green]Name[/]:', self.name)
         grid.add_row('[green]Short Name[/]:', self.shortName)
         grid.add_row('[green]Link[/]:', f'https://start.gg/{self.url}')
+        self.update_tree()
         grid.add_row('[green]Events[/]:', self.treeSmall)
 
         return Panel(grid, title='Tournament', expand=False)
@@ -366,4 +697,6 @@ class Tournament:
 
 if __name__ == '__main__':
     tournament = Tournament('the-laffy-invitational-3')
-    print(tournament.tree)
+    tournament.load_sets()
+    print(tournament.full_view())
+    print(client.summary_table())
@@ -1,5 +1,7 @@
 import startgg, re
+from functools import lru_cache
 from utils import check_files
+import profiling
 
 check_files()
 
@@ -27,7 +29,33 @@ PLAYER_2 = r'%P2'
 PLAYER_1_CHARS = r'%P1Chars'
 PLAYER_2_CHARS = r'%P2Chars'
 
-COLLAPSE_WS_REGEX = re.compile(r' +')
+ESCAPED_PERCENT = r'%%'
+
+PLACEHOLDERS = {
+    TOURNAMENT_NAME: 'tournamentName',
+    TOURNAMENT_SHORT: 'tournamentShort',
+    TOURNAMENT_LINK: 'tournamentLink',
+    EVENT_NAME: 'eventName',
+    PHASE_NAME: 'phaseName',
+    ROUND_FULL: 'roundFull',
+    ROUND_SHORT: 'roundShort',
+    GAME: 'game',
+    PLAYER_1: 'player1',
+    PLAYER_2: 'player2',
+    PLAYER_1_CHARS: 'player1Chars',
+    PLAYER_2_CHARS: 'player2Chars',
+}
+
+# Longest placeholders first so %P1Chars is never lexed as %P1 followed by "Chars"
+PLACEHOLDER_REGEX = re.compile('|'.join(re.escape(p) for p in sorted(
+    [ESCAPED_PERCENT, *PLACEHOLDERS], key=len, reverse=True)))
+# Only runs of two or more spaces need collapsing, matching single spaces makes every render rewrite the whole string
+COLLAPSE_WS_REGEX = re.compile(r' {2,}')
+
+def field_value(value) -> str:
+    # Missing values (like a tournament without a short name) are left out, the same in every export format
+    return '' if value is None else str(value)
+
 
 class TemplateArgs:
     tournamentName: str = 'Default Tournament'
@@ -57,6 +85,59 @@ class TemplateArgs:
         self.player1Chars = set.players[set.p1].print_chars()
         self.player2Chars = set.players[1-set.p1].print_chars()
 
+    def __setattr__(self, name: str, value) -> None:
+        super().__setattr__(name, field_value(value))
+
+
+class Template:
+    source: str
+    # Literal text and TemplateArgs attribute names, fields are stored as (None, attribute)
+    tokens: list[tuple[str, str]]
+
+    def __init__(self, source: str) -> None:
+        self.source = source
+        self.tokens = []
+
+        pos = 0
+        for m in PLACEHOLDER_REGEX.finditer(source):
+            if m.start() > pos:
+                self.tokens.append((source[pos:m.start()], None))
+            if m.group() == ESCAPED_PERCENT:
+                self.tokens.append(('%', None))
+            else:
+                self.tokens.append((None, PLACEHOLDERS[m.group()]))
+            pos = m.end()
+        if pos < len(source):
+            self.tokens.append((source[pos:], None))
+
+        # Render through a format string so each render is a single pass in C
+        self.format = ''.join(f'{{0.{field}}}' if text is None else text.replace('{', '{{').replace('}', '}}')
+                              for text, field in self.tokens)
+
+    @profiling.timed('templates.render')
+    def render(self, args: TemplateArgs) -> str:
+        text = self.format.format(args)
+        return COLLAPSE_WS_REGEX.sub(' ', text) if '  ' in text else text
+
+    @profiling.timed('templates.render')
+    def render_many(self, argsList: list[TemplateArgs]) -> list[str]:
+        format = self.format.format
+        sub = COLLAPSE_WS_REGEX.sub
+        return [sub(' ', text) if '  ' in text else text for text in map(format, argsList)]
+
+
+@lru_cache(maxsize=None)
+def compile_template(template: str) -> Template:
+    return Template(template)
+
+
+TITLE = compile_template(TITLE_TEMPLATE)
+DESCRIPTION = compile_template(DESCRIPTION_TEMPLATE)
+
 
 def parse(template: str, args: TemplateArgs) -> str:
-    return COLLAPSE_WS_REGEX.sub(' ', template.replace(TOURNAMENT_SHORT, args.tournamentShort).replace(TOURNAMENT_NAME, args.tournamentName).replace(TOURNAMENT_SHORT, args.tournamentShort).replace(TOURNAMENT_LINK, args.tournamentLink).replace(EVENT_NAME, args.eventName).replace(PHASE_NAME, args.phaseName).replace(GAME, args.game).replace(ROUND_FULL, args.roundFull).replace(ROUND_SHORT, args.roundShort).replace(PLAYER_1_CHARS, args.player1Chars).replace(PLAYER_2_CHARS, args.player2Chars).replace(PLAYER_1, args.player1).replace(PLAYER_2, args.player2))
+    return compile_template(template).render(args)
+
+
+def parse_many(template: str, argsList: list[TemplateArgs]) -> list[str]:
+    return compile_template(template).render_many(argsList)
@@ -0,0 +1,227 @@
+# YouTube thumbnails with the player tags and character icons over a frame from the video
+# Needs Pillow, and ffmpeg for the background frame
+
+import os
+import json
+import shutil
+import hashlib
+import threading
+import subprocess
+from urllib.parse import urlparse
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from rich import print
+from rich.progress import track
+
+try:
+    from PIL import Image, ImageDraw, ImageFont, ImageOps
+except ImportError:
+    Image = None
+
+import utils
+import startgg
+from vod import VOD
+
+THUMBNAIL_SIZE = (1280, 720)
+THUMBNAIL_WORKERS = min(8, os.cpu_count() or 1)
+DOWNLOAD_WORKERS = 8
+FRAME_TIMEOUT = 30
+# How far into the video the background frame is taken, as a fraction of its length
+FRAME_POSITION = 0.3
+# Background for videos without a frame
+BACKGROUND_COLOR = (24, 24, 32)
+
+ICON_SIZE = 112
+BAND_HEIGHT = 240
+MARGIN = 40
+NAME_SIZE = 64
+ROUND_SIZE = 48
+# Character image types, most preferred first
+ICON_TYPES = ['stockIcon', 'icon']
+FONTS = ['arialbd.ttf', 'DejaVuSans-Bold.ttf', 'LiberationSans-Bold.ttf']
+
+FFMPEG = shutil.which('ffmpeg')
+
+
+def available() -> bool:
+    return Image is not None
+
+
+class ImageCache:
+    """Downloaded images, stored under the hash of their contents so the same image is only kept once."""
+    path: str
+    index: dict[str, str]
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.indexPath = os.path.join(path, 'index.json')
+        self.lock = threading.Lock()
+        os.makedirs(self.path, exist_ok=True)
+        try:
+            with open(self.indexPath, 'r', encoding='utf-8') as f:
+                self.index = json.load(f)
+        except (OSError, ValueError):
+            self.index = {}
+
+    def file_path(self, url: str, digest: str) -> str:
+        return os.path.join(self.path, digest + (os.path.splitext(urlparse(url).path)[1] or '.png'))
+
+    def get(self, url: str) -> str:
+        """Local path of the image at url, downloading it if it isn't cached."""
+        digest = self.index.get(url)
+        if digest and os.path.exists(path := self.file_path(url, digest)):
+            return path
+
+        data = startgg.client.request('GET', url, 'image', limited=False).content
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.file_path(url, digest)
+        if not os.path.exists(path):
+            tmp = f'{path}.{threading.get_ident()}.tmp'
+            with open(tmp, 'wb') as f:
+                f.write(data)
+            os.replace(tmp, path)
+        with self.lock:
+            self.index[url] = digest
+        return path
+
+    def save(self) -> None:
+        with self.lock:
+            tmp = f'{self.indexPath}.tmp'
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(self.index, f)
+            os.replace(tmp, self.indexPath)
+
+
+imageCache = ImageCache(os.path.join(utils.FILE_CACHE_PATH, 'images'))
+
+
+def icon_url(character: startgg.Character) -> str:
+    for type in ICON_TYPES:
+        for image in character.images:
+            if image.type == type:
+                return image.url
+    return character.images[0].url if character.images else None
+
+
+def load_font(size: int):
+    for name in FONTS:
+        try:
+            return ImageFont.truetype(name, size)
+        except OSError:
+            continue
+    try:
+        return ImageFont.load_default(size)
+    except TypeError:
+        # Pillow before 10.1 only has the small bitmap font
+        return ImageFont.load_default()
+
+
+def fit_font(draw, text: str, size: int, width: int):
+    """Largest font up to size that fits text into width."""
+    font = load_font(size)
+    while size > 16 and draw.textlength(text, font=font) > width:
+        size -= 4
+        font = load_font(size)
+    return font
+
+
+def grab_frame(video: str, duration: float, output: str) -> bool:
+    if not FFMPEG:
+        return False
+    try:
+        result = subprocess.run([FFMPEG, '-v', 'error', '-y', '-ss', f'{(duration or 0) * FRAME_POSITION:.2f}',
+                                 '-i', video, '-frames:v', '1', output],
+                                capture_output=True, timeout=FRAME_TIMEOUT)
+    except (OSError, subprocess.SubprocessError):
+        return False
+    return result.returncode == 0 and os.path.exists(output)
+
+
+def render(job: dict) -> str:
+    """Draw one thumbnail. Runs in a worker process, so the job only holds plain data."""
+    width, height = THUMBNAIL_SIZE
+    frame = f'{job["output"]}.frame.png'
+    if grab_frame(job['video'], job['duration'], frame):
+        with Image.open(frame) as f:
+            image = ImageOps.fit(f.convert('RGB'), THUMBNAIL_SIZE)
+        os.remove(frame)
+    else:
+        image = Image.new('RGB', THUMBNAIL_SIZE, BACKGROUND_COLOR)
+
+    # Darken the bottom of the frame so the text stays readable
+    overlay = Image.new('RGBA', THUMBNAIL_SIZE, (0, 0, 0, 0))
+    ImageDraw.Draw(overlay).rectangle((0, height - BAND_HEIGHT, width, height), fill=(0, 0, 0, 170))
+    image = Image.alpha_composite(image.convert('RGBA'), overlay)
+    draw = ImageDraw.Draw(image)
+
+    roundFont = fit_font(draw, job['round'], ROUND_SIZE, width - 2 * MARGIN)
+    draw.text((width / 2, height - BAND_HEIGHT + MARGIN / 2), job['round'], font=roundFont, anchor='mt', fill='white')
+
+    for side, (name, icons) in enumerate(job['players']):
+        right = side == 1
+        x = width - MARGIN if right else MARGIN
+        for i, path in enumerate(icons):
+            try:
+                with Image.open(path) as icon:
+                    icon = ImageOps.contain(icon.convert('RGBA'), (ICON_SIZE, ICON_SIZE))
+            except OSError:
+                continue
+            offset = i * (ICON_SIZE + 8)
+            image.alpha_composite(icon, (int(x - offset - icon.width) if right else int(x + offset),
+                                         height - BAND_HEIGHT - icon.height - 8))
+
+        nameFont = fit_font(draw, name, NAME_SIZE, width / 2 - 2 * MARGIN)
+        draw.text((x, height - MARGIN), name, font=nameFont, anchor='rs' if right else 'ls', fill='white')
+
+    draw.text((width / 2, height - MARGIN), 'vs', font=load_font(ROUND_SIZE), anchor='ms', fill='white')
+    image.convert('RGB').save(job['output'], quality=90)
+    return job['output']
+
+
+def render_safe(job: dict) -> str:
+    try:
+        return render(job)
+    except (OSError, ValueError):
+        return None
+
+
+def make_job(vod: VOD, icons: dict[str, str]) -> dict:
+    players = [vod.set.players[vod.set.p1], vod.set.players[1 - vod.set.p1]]
+    names = [vod.templateArgs.player1, vod.templateArgs.player2]
+    return {'video': vod.path,
+            'duration': vod.duration,
+            'output': os.path.join(utils.THUMBNAILS_PATH, f'{os.path.splitext(vod.filename)[0]}.jpg'),
+            'round': f'{vod.templateArgs.eventName} {vod.templateArgs.roundFull}',
+            'players': [(name, [icons[u] for c in p.characters if (u := icon_url(c)) in icons])
+                        for name, p in zip(names, players)]}
+
+
+def generate(vods: list[VOD], quiet: bool = False) -> None:
+    """Make a thumbnail for each labelled VOD and set VOD.thumbnail to its path."""
+    vods = [v for v in vods if v.set]
+    os.makedirs(utils.THUMBNAILS_PATH, exist_ok=True)
+
+    # Every character image is downloaded once for the whole batch
+    urls = {u for v in vods for p in v.set.players for c in p.characters if (u := icon_url(c))}
+    icons = {}
+
+    def download(url):
+        try:
+            icons[url] = imageCache.get(url)
+        except utils.APIError as err:
+            print(f'[yellow]Could not download character image: {err}')
+
+    with ThreadPoolExecutor(max_workers=DOWNLOAD_WORKERS) as pool:
+        pool.map(download, urls)
+    imageCache.save()
+
+    jobs = [make_job(v, icons) for v in vods]
+    with ProcessPoolExecutor(max_workers=THUMBNAIL_WORKERS) as pool:
+        results = pool.map(render_safe, jobs)
+        if not quiet:
+            results = track(results, total=len(jobs), description='Making thumbnails...', transient=True)
+        for vod, path in zip(vods, results):
+            vod.thumbnail = os.path.abspath(path) if path else None
+
+    failed = sum(1 for v in vods if not v.thumbnail)
+    if failed:
+        print(f'[yellow]Could not make {failed} thumbnail{"s" if failed > 1 else ""}')
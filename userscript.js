@@ -1,6 +1,6 @@
 // ==UserScript==
 // @name         VODr
-// @version      1.0
+// @version      1.3
 // @description  Import title and description from VODr exports with one button press
 // @updateURL    https://raw.githubusercontent.com/yhsanave/VODr/main/userscript.js
 // @downloadURL  https://raw.githubusercontent.com/yhsanave/VODr/main/userscript.js
@@ -8,14 +8,37 @@
 // @supportURL   https://github.com/yhsanave/VODr
 // @author       Yhsanave
 // @match        https://studio.youtube.com/*
+// @grant        GM_xmlhttpRequest
+// @grant        GM_getValue
+// @grant        GM_setValue
+// @connect      127.0.0.1
 // ==/UserScript==
 
 (function () {
     'use strict';
+    // Port VODr serves the export on when run with --serve, change it with shift+F8 if you use --serve PORT
+    const DEFAULT_PORT = 8765;
     var data = {};
 
     window.addEventListener("keydown", keyboardHandler, false);
 
+    // Render a template (text and field indexes) with a video's references into the value table
+    function render(template, refs) {
+        return template.map(p => typeof p === 'number' ? data.values[refs[p]] : p).join('').replace(/ {2,}/g, ' ');
+    }
+
+    // Title and description for a file from the pasted export code, old exports are a plain filename -> entry object
+    function lookup(filename) {
+        if (data.version === undefined) {
+            return data[filename];
+        }
+        const entry = data.vods[filename];
+        if (!Array.isArray(entry)) {
+            return entry;
+        }
+        return { title: render(data.templates.title, entry), description: render(data.templates.description, entry) };
+    }
+
     // Set the value of the input field and then fire the input event to force it to update
     function setField(element, value) {
         element.textContent = value;
@@ -25,23 +48,45 @@
 
     function keyboardHandler(zEvent) {
         if (zEvent.key == 'F8') {
-            if (zEvent.ctrlKey) {
+            if (zEvent.shiftKey) {
+                const port = prompt('Port VODr is serving the export on (--serve PORT)', GM_getValue('port', DEFAULT_PORT));
+                if (port !== null) {
+                    if (/^\d+$/.test(port.trim())) {
+                        GM_setValue('port', parseInt(port.trim()));
+                    } else {
+                        alert('Invalid port: ' + port);
+                    }
+                }
+            } else if (zEvent.ctrlKey) {
                 data = JSON.parse(prompt('Paste VODr export code here'));
+                if (data.version > 2) {
+                    alert('This export code is from a newer version of VODr, please update the userscript');
+                }
             } else {
                 const filename = document.querySelector('#original-filename').textContent.trim();
                 const titleField = document.querySelector('#title-textarea > ytcp-form-input-container:nth-child(1) > div:nth-child(1) > div:nth-child(3) > div:nth-child(1) > ytcp-social-suggestion-input:nth-child(1) > div:nth-child(1)');
                 const descField = document.querySelector('#description-textarea > ytcp-form-input-container:nth-child(1) > div:nth-child(1) > div:nth-child(3) > div:nth-child(1) > ytcp-social-suggestion-input:nth-child(1) > div:nth-child(1)');
 
-                try {
-                    if (data[filename]) {
-                        setField(titleField, data[filename].title);
-                        setField(descField, data[filename].description);
-                    } else {
-                        alert('Filename not found, press ctrl+F8 to enter your export code and do not rename files after processing them');
+                const fill = (entry) => {
+                    try {
+                        if (entry) {
+                            setField(titleField, entry.title);
+                            setField(descField, entry.description);
+                        } else {
+                            alert('Filename not found, press ctrl+F8 to enter your export code and do not rename files after processing them');
+                        }
+                    } catch (err) {
+                        console.error(err);
                     }
-                } catch (err) {
-                    console.error(err);
-                }
+                };
+
+                // Ask VODr for just this video, and use the pasted export code if it isn't running
+                GM_xmlhttpRequest({
+                    method: 'GET',
+                    url: `http://127.0.0.1:${GM_getValue('port', DEFAULT_PORT)}/export/${encodeURIComponent(filename)}`,
+                    onload: (res) => fill(res.status == 200 ? JSON.parse(res.responseText) : lookup(filename)),
+                    onerror: () => fill(lookup(filename))
+                });
             }
 
             zEvent.preventDefault();
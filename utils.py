@@ -1,10 +1,11 @@
 import json
 import re
 import os
-from functools import reduce
 from rich import print
 import sys
 
+import profiling
+
 VIDEO_FORMAT_REGEX = r'.*\.(?:MOV|MPEG-1|MPEG-2|MPEG4|MP4|MPG|AVI|WMV|MPEGPS|FLV|WEBM)$'
 TOURNAMENT_LINK_REGEX = r'https?:\/\/(?:www\.)?start\.gg(?:\/tournament)?\/(?:(?:(.+?)(?=\/))|(.+))'
 
@@ -14,6 +15,13 @@ DEFAULT_DESCRIPTION_TEMPLATE = '%P1 vs %P2 playing %Game at %Tournament in %Roun
 VIDEOS_PATH = 'videos'
 TEMPLATES_PATH = 'templates'
 API_TOKEN_PATH = 'token.txt'
+CACHE_PATH = 'cache'
+# Kept out of the top level of the response cache so eviction doesn't count them
+FILE_CACHE_PATH = os.path.join(CACHE_PATH, 'files')
+THUMBNAILS_PATH = 'thumbnails'
+CLIPS_PATH = 'clips'
+JOURNAL_PATH = 'journal.jsonl'
+EXPORT_PATH = 'export.json'
 
 
 class InvalidLinkError(Exception):
@@ -28,6 +36,22 @@ class CharacterNotFoundError(Exception):
     pass
 
 
+class ManifestError(Exception):
+    pass
+
+
+class APIError(Exception):
+    pass
+
+
+class RateLimitError(APIError):
+    pass
+
+
+class QueryComplexityError(APIError):
+    pass
+
+
 def parse_link(link: str) -> str:
     m = re.match(TOURNAMENT_LINK_REGEX, link)
     if m:
@@ -46,16 +70,16 @@ def file_name_safe(name: str) -> str:
     return name.replace('<', '').replace('>', '').replace(':', '').replace('"', '').replace('/', '%2F').replace('\\', '').replace('|', '').replace('?', '').replace('*', '')
 
 
+@profiling.timed('export.code')
 def export_code(vods) -> str:
-    filtered = filter(lambda v: v.processed, vods)
-    if filtered:
-        dicts = map(lambda v: v.export_dict(), filtered)
-        dict = reduce(lambda a, b: a | b, dicts)
-        return json.dumps(dict)
-    else:
-        return ''
+    export = {}
+    for vod in vods:
+        if vod.processed:
+            export.update(vod.export_dict())
+    return json.dumps(export) if export else ''
 
 def leave() -> None:
+    profiling.finish()
     input('Press [Enter] to exit...')
     sys.exit()
 
@@ -6,16 +6,28 @@ from rich.table import Table
 import startgg
 import utils
 import templates
+import profiling
 
 ARGUMENTS_LIST = ['Tournament', 'Tournament Short', 'Link', 'Event', 'Phase', 'Round',
                   'Round Short', 'Game', 'Player 1', 'Player 2', 'Player 1 Characters', 'Player 2 Characters']
 
 
+# Longest time between a file being created and last written that is still treated as one recording
+MAX_RECORDING_DURATION = 6 * 60 * 60
+
+
 class VOD:
     filename: str
     path: str
     processed: bool = False
 
+    station: int = None
+    duration: float = None
+    # Container metadata, filled in by probe
+    metadata = None
+    probed: bool = False
+    suggestion = None
+
     tournament: startgg.Tournament = None
     event: startgg.Event = None
     phase: startgg.Phase = None
@@ -24,10 +36,12 @@ class VOD:
     templateArgs: templates.TemplateArgs = None
     title: str = ''
     description: str = ''
+    thumbnail: str = None
 
-    def __init__(self, filename: str) -> None:
+    def __init__(self, filename: str, path: str = None, station: int = None) -> None:
         self.filename = filename
-        self.path = os.path.join(utils.VIDEOS_PATH, filename)
+        self.path = path or os.path.join(utils.VIDEOS_PATH, filename)
+        self.station = station
 
     def __rich_repr__(self):
         yield 'Tournament', self.tournament
@@ -88,10 +102,8 @@ class VOD:
         return Panel(grid, title='Edit Values', expand=False)
 
     def process_template(self) -> None:
-        self.title = templates.parse(
-            templates.TITLE_TEMPLATE, self.templateArgs)
-        self.description = templates.parse(
-            templates.DESCRIPTION_TEMPLATE, self.templateArgs)
+        self.title = templates.TITLE.render(self.templateArgs)
+        self.description = templates.DESCRIPTION.render(self.templateArgs)
 
     def generate_template_args(self):
         self.templateArgs = templates.TemplateArgs(
@@ -135,6 +147,29 @@ class VOD:
 
         self.process_template()
 
+    def recording_interval(self) -> tuple[float, float]:
+        """Estimate when the video was recorded from the container or file times, or None if it can't be told."""
+        # The creation time written by the capture card is the recording start and survives copying the file
+        if self.metadata and self.metadata.created and self.duration:
+            return self.metadata.created, self.metadata.created + self.duration
+
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+
+        # Capture cards stop writing when the recording ends, and copying the file keeps the modified time
+        end = stat.st_mtime
+        if self.duration:
+            return end - self.duration, end
+
+        # Creation time is only the recording start if the file wasn't copied afterwards
+        created = getattr(stat, 'st_birthtime', stat.st_ctime if os.name == 'nt' else None)
+        if created and 0 < end - created < MAX_RECORDING_DURATION:
+            return created, end
+        return None
+
+    @profiling.timed('video.open')
     def open_video(self) -> None:
         if os.path.exists(self.path):
             print(f'Opening Video: [underline link={os.path.abspath(self.path)}]{self.filename}[/]')
@@ -143,12 +178,13 @@ class VOD:
             print(f'Video not found: {self.path}')
 
     def export_dict(self):
-        return {
-            self.filename: {
-                'title': self.title,
-                'description': self.description
-            }
+        export = {
+            'title': self.title,
+            'description': self.description
         }
+        if self.thumbnail:
+            export['thumbnail'] = self.thumbnail
+        return {self.filename: export}
 
 
 if __name__ == '__main__':